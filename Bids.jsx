@@ -12,7 +12,9 @@ export default function Bids() {
   useEffect(() => {
     const fetchBids = async () => {
       try {
-        const url = clientFilter ? `/bids?client=${clientFilter}` : "/bids";
+        // The list only shows summary fields, so skip the quote and photo payloads
+        const exclude = "exclude=quote_data,before_photos,after_photos";
+        const url = clientFilter ? `/bids?client=${clientFilter}&${exclude}` : `/bids?${exclude}`;
         const res = await api.get(url);
         setBids(res.data);
       } catch (err) {
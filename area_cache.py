@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from cache import LRUCache
+from executors import executors
+from metrics import span
+from square_footage_estimator import estimate_area_from_image, no_room_detected, perceptual_hash
+
+AREA_CACHE_SIZE = int(os.getenv("AREA_CACHE_SIZE", "4096"))
+AREA_CACHE_MAX_DISTANCE = int(os.getenv("AREA_CACHE_MAX_DISTANCE", "6"))
+AREA_CACHE_PATH = os.getenv("AREA_CACHE_PATH")  # unset keeps the cache in memory only
+
+# The 64-bit hash is split into bands; any hash within MAX_DISTANCE < BANDS bits
+# of a stored one shares at least one band with it
+BANDS = 8
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def _bands(phash):
+    return [(i, (phash >> (i * BAND_BITS)) & BAND_MASK) for i in range(BANDS)]
+
+
+class PerceptualCache:
+    """LRU of area estimates keyed by (known width, perceptual hash).
+
+    Lookups match the nearest stored hash within ``max_distance`` bits, found
+    through a banded index rather than a scan. With ``path`` set the entries
+    are loaded at startup and written back by ``save``.
+    """
+
+    def __init__(self, maxsize=AREA_CACHE_SIZE, max_distance=AREA_CACHE_MAX_DISTANCE, path=AREA_CACHE_PATH):
+        self.maxsize = maxsize
+        self.max_distance = max_distance
+        self.path = path
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (width, phash) -> result
+        self._bands = {}  # (width, band, value) -> {phash}
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def _index(self, width, phash):
+        for band, value in _bands(phash):
+            self._bands.setdefault((width, band, value), set()).add(phash)
+
+    def _unindex(self, width, phash):
+        for band, value in _bands(phash):
+            bucket = self._bands.get((width, band, value))
+            if bucket is not None:
+                bucket.discard(phash)
+                if not bucket:
+                    del self._bands[(width, band, value)]
+
+    def _nearest(self, width, phash):
+        if (width, phash) in self._entries:
+            return phash
+        best, best_distance = None, self.max_distance + 1
+        for band, value in _bands(phash):
+            for candidate in self._bands.get((width, band, value), ()):
+                distance = bin(candidate ^ phash).count("1")
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        return best
+
+    def get(self, phash, width):
+        with self._lock:
+            match = self._nearest(width, phash)
+            if match is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((width, match))
+            self.hits += 1
+            if match != phash:
+                self.near_hits += 1
+            return dict(self._entries[(width, match)])
+
+    def set(self, phash, width, result):
+        with self._lock:
+            key = (width, phash)
+            if key not in self._entries:
+                self._index(width, phash)
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                (old_width, old_hash), _ = self._entries.popitem(last=False)
+                self._unindex(old_width, old_hash)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bands.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                rows = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for width, phash, result in rows[-self.maxsize:]:
+            self.set(int(phash, 16), width, result)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            rows = [[width, format(phash, "016x"), result] for (width, phash), result in self._entries.items()]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Unique per writer: every worker saves the same path at shutdown
+        partial = f"{self.path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(partial, "w") as f:
+                json.dump(rows, f)
+            os.replace(partial, self.path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "persistent": bool(self.path),
+        }
+
+
+area_cache = PerceptualCache()
+# Exact re-uploads skip decoding altogether: content digest -> perceptual hash
+phash_cache = LRUCache(maxsize=AREA_CACHE_SIZE)
+
+
+async def cached_area_estimate(image: bytes, known_width_inches=120):
+    """Area estimate for an encoded photo, reusing results for duplicate and near-duplicate shots."""
+    width = float(known_width_inches)
+    digest = hashlib.sha256(image).hexdigest()
+    phash = phash_cache.get(digest)
+    if phash is None:
+        phash = await executors.run_cpu(perceptual_hash, image)
+        if phash is None:
+            return no_room_detected("Image could not be decoded")
+        phash_cache.set(digest, phash)
+    result = area_cache.get(phash, width)
+    if result is not None:
+        return result
+    with span("area_estimate"):
+        result = await executors.run_cpu(estimate_area_from_image, image, width)
+    area_cache.set(phash, width, result)
+    return result
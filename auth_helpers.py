@@ -10,7 +10,7 @@ def require_pro(func):
         if not auth_header:
             raise HTTPException(status_code=401, detail="Missing Authorization Header")
         
-        user = verify_firebase_token(auth_header)
+        user = await verify_firebase_token(auth_header)
         uid = user["uid"]
 
         if db["subscriptions"].get(uid) != "pro":
@@ -32,7 +32,7 @@ def require_subscription(minimum: str = "pro"):
             if not auth_header:
                 raise HTTPException(status_code=401, detail="Missing Authorization Header")
 
-            user = verify_firebase_token(auth_header)
+            user = await verify_firebase_token(auth_header)
             uid = user["uid"]
 
             user_level = db["subscriptions"].get(uid, "free")
@@ -0,0 +1,316 @@
+"""Micro-benchmarks for the quote, PDF, OpenCV, bid store and record hot paths.
+
+    python bench.py                        # run everything, write bench_results.json
+    python bench.py --only quote,store     # run a subset of groups
+    python bench.py --save-baseline        # also record the results as the baseline
+    python bench.py --compare              # exit 1 if anything regressed past its threshold
+
+Numbers are only comparable on the same machine, so the baseline file is
+meant to be recorded locally (or in CI) rather than committed.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+import uuid
+
+import cv2
+import numpy as np
+
+RESULTS_PATH = "bench_results.json"
+BASELINE_PATH = "bench_baseline.json"
+DEFAULT_THRESHOLD = 0.25
+# Noisier benchmarks get more slack before they count as a regression
+THRESHOLDS = {"pdf": 0.5, "area": 0.5}
+BID_COUNTS = (100, 10_000, 1_000_000)
+RECORD_COUNT = 1_000_000
+AREA_RESOLUTIONS = ((640, 480), (1920, 1080), (4032, 3024))
+
+QUOTE_INPUT = {
+    "square_footage": 1850, "num_pets": 1, "num_windows": 12, "cleanliness": 3, "travel_miles": 8,
+    "state": "TX", "windows_outside": False, "knickknack": 2, "floor_carpet": True, "floor_hardwood": True,
+}
+
+
+def measure(fn, repeat=5, min_time=0.2):
+    """Median and best seconds per call, auto-scaling the loop count to ``min_time``."""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    runs = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    median = statistics.median(runs)
+    return {"median_s": median, "min_s": min(runs), "ops_per_s": 1 / median if median else None, "loops": number}
+
+
+def bench_quote():
+    from quote_engine import calculate_quote, calculate_quotes, price_quote, price_sweep, quote_cache, quote_columns
+
+    results = {}
+    results["quote.price_quote"] = measure(lambda: price_quote(QUOTE_INPUT))
+    sizes = iter(range(10**9))
+    results["quote.calculate_quote.miss"] = measure(
+        lambda: calculate_quote({**QUOTE_INPUT, "square_footage": 500 + next(sizes)})
+    )
+    quote_cache.clear()
+    calculate_quote(QUOTE_INPUT)
+    results["quote.calculate_quote.hit"] = measure(lambda: calculate_quote(QUOTE_INPUT))
+
+    rng = np.random.default_rng(0)
+    rows = [{**QUOTE_INPUT, "square_footage": int(s)} for s in rng.integers(500, 5000, 10_000)]
+    columns = quote_columns(rows)
+    batch = measure(lambda: calculate_quotes(columns), repeat=3)
+    batch["rows"] = len(rows)
+    batch["rows_per_s"] = len(rows) / batch["median_s"]
+    results["quote.calculate_quotes.10k"] = batch
+    # The bid calculator's pricing grid: 25 sizes x 6 cleanliness levels x 4 pet counts
+    axes = {"square_footage": {"start": 500, "stop": 5300, "step": 200}, "cleanliness": [0, 1, 2, 3, 4, 5],
+            "num_pets": [0, 1, 2, 3]}
+    results["quote.price_sweep.600"] = measure(lambda: price_sweep(QUOTE_INPUT, axes), repeat=20)
+    return results
+
+
+def _signature_png(directory):
+    image = np.full((120, 400), 255, np.uint8)
+    cv2.putText(image, "J. Client", (20, 80), cv2.FONT_HERSHEY_SCRIPT_SIMPLEX, 2, 0, 3)
+    path = os.path.join(directory, "signature.png")
+    cv2.imwrite(path, image)
+    return path
+
+
+def bench_pdf():
+    from models import Bid, BusinessProfile, Client
+    from pdf_generator import generate_contract_pdf, generate_estimate_pdf
+    from quote_engine import price_quote
+
+    business = BusinessProfile(
+        owner_id="bench", owner_name="Pat Owner", business_name="Sparkle Cleaning",
+        business_address="1 Main St", contact_email="owner@example.com", contact_number="555-0100",
+    )
+    client = Client(
+        client_id="c1", owner_id="bench", name="Jamie Client", contact_email="client@example.com",
+        contact_number="555-0199", cleaning_frequency="weekly",
+    )
+    quote = price_quote(QUOTE_INPUT)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "out.pdf")
+        bid = Bid(bid_id="b1", owner_id="bench", client_id="c1", bid_address="2 Elm St", notes="Two dogs.",
+                  quote_data=quote)
+        signed = bid.copy(update={"signed_contract": {
+            "name": "Jamie Client", "timestamp": "2024-01-01T12:00:00", "signature_path": _signature_png(tmp),
+        }})
+        results["pdf.estimate"] = measure(lambda: generate_estimate_pdf(business, quote, out), repeat=3)
+        results["pdf.contract"] = measure(
+            lambda: generate_contract_pdf(business, client, bid, quote, "weekly", out), repeat=3
+        )
+        results["pdf.contract.signed"] = measure(
+            lambda: generate_contract_pdf(business, client, signed, quote, "weekly", out), repeat=3
+        )
+    return results
+
+
+def _room_photo(width, height):
+    image = np.full((height, width, 3), 200, np.uint8)
+    cv2.rectangle(image, (width // 5, height // 5), (width * 4 // 5, height * 4 // 5), (40, 40, 40), -1)
+    noise = np.random.default_rng(0).integers(0, 12, image.shape, dtype=np.uint8)
+    return cv2.imencode(".jpg", cv2.add(image, noise), [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def bench_area():
+    from square_footage_estimator import estimate_area_from_image, perceptual_hash
+
+    results = {}
+    for width, height in AREA_RESOLUTIONS:
+        data = _room_photo(width, height)
+        results[f"area.estimate.{width}x{height}"] = measure(lambda: estimate_area_from_image(data), repeat=3)
+        results[f"area.phash.{width}x{height}"] = measure(lambda: perceptual_hash(data), repeat=3)
+    return results
+
+
+def _bids(owner_id, count, clients=50):
+    from models import Bid
+
+    return [
+        Bid.construct(
+            bid_id=str(uuid.UUID(int=i)), owner_id=owner_id, client_id=f"client-{i % clients}",
+            bid_address=f"{i} Main St", notes="", before_photos=[], after_photos=[],
+            quote_input=None, quote_data=None, signed_contract=None,
+        )
+        for i in range(count)
+    ]
+
+
+def _open_store(backend, directory):
+    if backend == "sqlite":
+        from sqlite_store import open_sqlite_db
+
+        return open_sqlite_db(os.path.join(directory, "bench.sqlite3"))["bids"]
+    from database import BidStore
+
+    return BidStore()
+
+
+def bench_store(counts=BID_COUNTS, backends=("memory",)):
+    results = {}
+    for backend in backends:
+        for count in counts:
+            with tempfile.TemporaryDirectory() as tmp:
+                store = _open_store(backend, tmp)
+                bids = _bids("bench", count)
+                start = time.perf_counter()
+                store.add_many(bids)
+                load = time.perf_counter() - start
+                middle = bids[count // 2].bid_id
+                del bids
+                prefix = f"store.{backend}.{count}"
+                results[f"{prefix}.add_many"] = {"median_s": load / count, "min_s": load / count,
+                                                 "ops_per_s": count / load, "loops": count}
+                results[f"{prefix}.get"] = measure(lambda: store.get("bench", middle))
+                results[f"{prefix}.page.first"] = measure(lambda: store.page("bench", 0, 50))
+                results[f"{prefix}.page.deep"] = measure(lambda: store.page("bench", count // 2, 50))
+                results[f"{prefix}.page.client"] = measure(lambda: store.page("bench", 0, 50, client_id="client-7"))
+                results[f"{prefix}.for_client"] = measure(lambda: len(store.for_client("bench", "client-7")), repeat=3)
+    return results
+
+
+def _quoted_bids(kind, count, clients=50):
+    from models import Bid
+    from quote_engine import normalize_quote_input, price_quote
+    from records import BidRecord
+
+    quote_input = normalize_quote_input(QUOTE_INPUT)
+    quote = price_quote(quote_input)
+    build = Bid if kind == "model" else BidRecord
+    return [
+        build(
+            bid_id=str(uuid.UUID(int=i)), owner_id="bench", client_id=f"client-{i % clients}",
+            bid_address=f"{i} Main St", notes="", quote_input=dict(quote_input), quote_data=dict(quote),
+        )
+        for i in range(count)
+    ]
+
+
+def bench_records(count=RECORD_COUNT):
+    """Bytes per quoted bid and list-serialization time, pydantic Bid versus BidRecord."""
+    results = {}
+    for kind in ("model", "record"):
+        tracemalloc.start()
+        bids = _quoted_bids(kind, count)
+        allocated = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        body = "[" + ",".join(b.json() for b in bids) + "]"
+        elapsed = time.perf_counter() - start
+        del bids, body
+        prefix = f"records.{kind}.{count}"
+        results[f"{prefix}.bytes_per_bid"] = {"median_s": allocated / count, "min_s": allocated / count,
+                                              "ops_per_s": None, "loops": count}
+        results[f"{prefix}.serialize"] = {"median_s": elapsed, "min_s": elapsed,
+                                          "ops_per_s": count / elapsed, "loops": 1}
+    return results
+
+
+GROUPS = {
+    "quote": bench_quote, "pdf": bench_pdf, "area": bench_area, "store": bench_store, "records": bench_records,
+}
+
+
+def _metadata():
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Rows of (name, baseline, current, ratio, regressed) for benchmarks present in both runs."""
+    rows = []
+    for name, current in sorted(results.items()):
+        before = baseline.get(name)
+        if not before:
+            continue
+        ratio = current["median_s"] / before["median_s"]
+        limit = THRESHOLDS.get(name.split(".", 1)[0], threshold)
+        rows.append((name, before["median_s"], current["median_s"], ratio, ratio > 1 + limit))
+    return rows
+
+
+def _format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def _format_value(name, value):
+    # Memory results reuse the median_s slot so --compare treats growth as a regression
+    return f"{value:.0f}B" if name.endswith(".bytes_per_bid") else _format_seconds(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help="comma-separated groups: " + ",".join(GROUPS))
+    parser.add_argument("--bids", default=",".join(map(str, BID_COUNTS)), help="bid counts per owner")
+    parser.add_argument("--records", type=int, default=RECORD_COUNT, help="quoted bids for the records group")
+    parser.add_argument("--backends", default="memory", help="bid stores to measure: memory,sqlite")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="exit 1 on any regression past the threshold")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction of the baseline median")
+    args = parser.parse_args(argv)
+
+    groups = args.only.split(",") if args.only else list(GROUPS)
+    results = {}
+    for group in groups:
+        print(f"running {group}...", file=sys.stderr)
+        if group == "store":
+            results.update(bench_store(
+                tuple(int(n) for n in args.bids.split(",")), tuple(args.backends.split(","))
+            ))
+        elif group == "records":
+            results.update(bench_records(args.records))
+        else:
+            results.update(GROUPS[group]())
+
+    report = {"meta": _metadata(), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        print(f"{name:45} {_format_value(name, result['median_s']):>10}")
+
+    if not args.compare:
+        return 0
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    except FileNotFoundError:
+        print(f"no baseline at {args.baseline}; run with --save-baseline first", file=sys.stderr)
+        return 1
+    regressions = 0
+    print()
+    for name, before, after, ratio, regressed in compare(results, baseline, args.threshold):
+        regressions += regressed
+        flag = "REGRESSED" if regressed else ""
+        print(f"{name:45} {_format_value(name, before):>10} -> {_format_value(name, after):>10} {ratio:6.2f}x {flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import os
+import uuid
+
+from branding import brand_assets
+from database import db
+from executors import executors
+from utils.logger import log_event
+from thumbnails import THUMBNAIL_SIZES, digest_of, make_thumbnails, thumbnail_path
+from uploads import IMAGE_TYPES, MAX_FILE_BYTES, UPLOAD_DIR, check_type, iter_upload
+
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+
+_background = set()
+
+
+def blob_path(digest, extension):
+    return os.path.join(BLOB_DIR, digest[:2], f"{digest}{extension}")
+
+
+def find_blob(digest):
+    """Path of the stored blob for ``digest``, whatever its extension, or None."""
+    if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+        return None
+    for extension in IMAGE_TYPES.values():
+        path = blob_path(digest, extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _write_hashed(out, hasher, chunk):
+    hasher.update(chunk)
+    out.write(chunk)
+
+
+def _commit_blob(partial, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        # Same content is already stored; keep the existing copy
+        os.remove(partial)
+        return False
+    os.replace(partial, path)
+    return True
+
+
+async def _build_thumbnails(path):
+    try:
+        await executors.run_cpu(make_thumbnails, path)
+    except Exception as e:
+        log_event(f"Thumbnail generation failed for {path}", level="warning", error=e, path=path)
+
+
+def _in_background(coro):
+    task = asyncio.get_running_loop().create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def store_upload(uploaded, budget=None, max_bytes=MAX_FILE_BYTES, allowed=IMAGE_TYPES):
+    """Stream an upload into the content-addressed store and return its blob path.
+
+    Identical content always lands on the same path, so re-uploads are
+    deduplicated. Newly stored images get thumbnails built in the background.
+    The caller is responsible for ``retain``-ing the returned path.
+    """
+    if not uploaded or not uploaded.filename:
+        return None
+    chunks = iter_upload(uploaded, budget, max_bytes)
+    first = await anext(chunks, b"")
+    if not first:
+        return None
+    extension = IMAGE_TYPES[check_type(first, allowed)]
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    partial = os.path.join(BLOB_DIR, f".upload_{uuid.uuid4().hex}.part")
+    hasher = hashlib.sha256()
+    out = await executors.run_io(open, partial, "wb")
+    try:
+        await executors.run_io(_write_hashed, out, hasher, first)
+        async for chunk in chunks:
+            await executors.run_io(_write_hashed, out, hasher, chunk)
+    except BaseException:
+        await executors.run_io(out.close)
+        await executors.run_io(os.remove, partial)
+        raise
+    await executors.run_io(out.close)
+    path = blob_path(hasher.hexdigest(), extension)
+    if await executors.run_io(_commit_blob, partial, path):
+        _in_background(_build_thumbnails(path))
+    return path
+
+
+async def gather_stored(*stores):
+    """Await store_upload/store_uploads calls together, returning their results in order.
+
+    If any of them fails, blobs the others already stored are deleted
+    (unless something references them) before the first error is re-raised.
+    """
+    results = await asyncio.gather(*stores, return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        stored = []
+        for result in results:
+            if isinstance(result, str):
+                stored.append(result)
+            elif isinstance(result, list):
+                stored.extend(result)
+        await executors.run_io(_discard_unreferenced, stored)
+        raise errors[0]
+    return results
+
+
+async def store_uploads(files, budget=None, max_bytes=MAX_FILE_BYTES, allowed=IMAGE_TYPES):
+    """Store several uploads concurrently, returning their blob paths in order."""
+    paths = await gather_stored(*(store_upload(f, budget, max_bytes, allowed) for f in files or []))
+    return [p for p in paths if p]
+
+
+def is_blob(path):
+    return bool(path) and os.path.normpath(path).startswith(BLOB_DIR + os.sep)
+
+
+def retain(*paths):
+    for path in paths:
+        if is_blob(path):
+            db["blob_refs"].incr(path)
+
+
+async def release(*paths):
+    """Drop one reference to each blob, deleting blobs nobody references with their thumbnails and brand assets."""
+    for path in paths:
+        if is_blob(path) and db["blob_refs"].decr(path) == 0:
+            await executors.run_io(_delete_blob, path)
+
+
+def _delete_blob(path):
+    digest = digest_of(path)
+    derived = [thumbnail_path(digest, size) for size in THUMBNAIL_SIZES] + brand_assets(digest)
+    for target in [path] + derived:
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+
+
+def _discard_unreferenced(paths):
+    for path in paths:
+        if is_blob(path) and not db["blob_refs"].get(path):
+            _delete_blob(path)
@@ -0,0 +1,134 @@
+import glob
+import os
+import uuid
+
+import cv2
+import numpy as np
+
+from cache import LRUCache
+from executors import executors
+from thumbnails import digest_of
+from utils.logger import log_event
+
+BRAND_DIR = os.path.join("uploads", "blobs", "brand")
+BRAND_CACHE_SIZE = int(os.getenv("BRAND_CACHE_SIZE", "1024"))
+BRAND_DPI = 200
+LOGO_BOX_MM = (40, 20)  # width, height the logo is fitted into
+QR_SIZE_MM = 30
+# Bump when the preparation below changes so old assets are not reused
+ASSET_VERSION = 1
+
+PAYMENT_QRS = (("qr_venmo_url", "Venmo"), ("qr_paypal_url", "PayPal"))
+
+
+def _mm_to_px(mm):
+    return max(1, round(mm / 25.4 * BRAND_DPI))
+
+
+def _flatten(image):
+    """8-bit BGR image with any alpha channel composited onto white."""
+    if image.dtype == np.uint16:
+        image = (image // 257).astype(np.uint8)
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.shape[2] == 4:
+        alpha = image[:, :, 3:].astype(np.float32) / 255
+        return (image[:, :, :3] * alpha + 255 * (1 - alpha)).astype(np.uint8)
+    return image
+
+
+def brand_assets(digest):
+    """Every prepared logo and QR asset derived from the blob with ``digest``, across versions."""
+    return glob.glob(os.path.join(BRAND_DIR, f"{digest}_*"))
+
+
+def prepare_asset(path, box_mm, kind):
+    """Downscale the image at ``path`` to fit ``box_mm`` at BRAND_DPI; runs on the process pool.
+
+    Logos become JPEGs and QR codes grayscale PNGs, both formats fpdf embeds
+    without decoding pixels. Returns {"path", "w", "h"} in mm, or None when
+    the image cannot be read.
+    """
+    source = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if source is None:
+        return None
+    image = _flatten(source)
+    height, width = image.shape[:2]
+    box_w, box_h = box_mm
+    scale_mm = min(box_w / width, box_h / height)
+    w_mm, h_mm = width * scale_mm, height * scale_mm
+    dims = (_mm_to_px(w_mm), _mm_to_px(h_mm))
+    if dims[0] < width:
+        image = cv2.resize(image, dims, interpolation=cv2.INTER_AREA)
+    if kind == "qr":
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        extension, params = ".png", [cv2.IMWRITE_PNG_COMPRESSION, 6]
+    else:
+        extension, params = ".jpg", [cv2.IMWRITE_JPEG_QUALITY, 90]
+    target = os.path.join(BRAND_DIR, f"{digest_of(path)}_{kind}_v{ASSET_VERSION}{extension}")
+    if not os.path.exists(target):
+        os.makedirs(BRAND_DIR, exist_ok=True)
+        partial = f"{target}.{uuid.uuid4().hex}{extension}"
+        cv2.imwrite(partial, image, params)
+        os.replace(partial, target)
+    return {"path": target, "w": round(w_mm, 2), "h": round(h_mm, 2)}
+
+
+def prepare_brand(logo_url=None, qr_urls=()):
+    """The logo and labelled payment QR assets a branded PDF embeds."""
+    logo = prepare_asset(logo_url, LOGO_BOX_MM, "logo") if logo_url else None
+    qrs = []
+    for label, url in qr_urls:
+        asset = prepare_asset(url, (QR_SIZE_MM, QR_SIZE_MM), "qr")
+        if asset:
+            qrs.append({**asset, "label": label})
+    return {"logo": logo, "qrs": qrs}
+
+
+def _sources(business):
+    qrs = tuple((label, getattr(business, field)) for field, label in PAYMENT_QRS if getattr(business, field))
+    return business.logo_url, qrs
+
+
+def _present(brand):
+    assets = ([brand["logo"]] if brand["logo"] else []) + brand["qrs"]
+    return all(os.path.exists(asset["path"]) for asset in assets)
+
+
+class BrandCache:
+    """Prepared branding per owner, so PDF renders never decode the original uploads.
+
+    Entries remember the image URLs they were built from, so a profile
+    changed through another worker is still noticed; ``invalidate`` drops
+    an owner's entry as soon as this worker saves their profile.
+    """
+
+    def __init__(self, maxsize=BRAND_CACHE_SIZE):
+        self._entries = LRUCache(maxsize=maxsize)  # owner_id -> (sources, brand)
+
+    async def layout(self, business):
+        if not business:
+            return None
+        sources = _sources(business)
+        if not sources[0] and not sources[1]:
+            return None
+        entry = self._entries.get(business.owner_id)
+        if entry and entry[0] == sources and _present(entry[1]):
+            return entry[1]
+        try:
+            brand = await executors.run_cpu(prepare_brand, *sources)
+        except Exception as e:
+            # Fall back to the plain layout rather than failing the document
+            log_event("Brand preparation failed", level="warning", user_id=business.owner_id, error=e)
+            return None
+        self._entries.set(business.owner_id, (sources, brand))
+        return brand
+
+    def invalidate(self, owner_id):
+        self._entries.pop(owner_id)
+
+    def stats(self):
+        return self._entries.stats()
+
+
+brand_cache = BrandCache()
@@ -1,20 +1,68 @@
-from icalendar import Calendar, Event
-from datetime import datetime, timedelta
-import uuid
-
-def generate_ics(client_name, address, start_date, phone, email, pdf_path):
-    cal = Calendar()
-    event = Event()
-
-    event.add("summary", f"Cleaning Service for {client_name}")
-    event.add("dstart", start_date)
-    event.add("dtend", start_date + timedelta(hours=3)) # default 3 hour block
-    event.add("location", address)
-    event.add("phone", phone)
-    event.add("email", email)
-    event.add("description", "Convirmed via Home Cleaner's Assistant")
-    event["uid"] = str(uuid.uuid4)
-
-    cal.add_component(event)
-    with open(pdf_path, "wb") as f:
-        f.write(cal.to_ical())
+from icalendar import Calendar, Event, vRecur
+from datetime import datetime, timedelta
+
+SERVICE_START_HOUR = 9
+SERVICE_DURATION = timedelta(hours=3)  # default 3 hour block
+PRODID = "-//Home Cleaner's Assistant//Cleaning Schedule//EN"
+
+# CleaningFrequency -> RRULE; bimonthly visits are every other week (the biweekly price)
+RECURRENCE_RULES = {
+    "single": None,
+    "weekly": {"FREQ": "WEEKLY"},
+    "bimonthly": {"FREQ": "WEEKLY", "INTERVAL": 2},
+}
+
+
+def _value(value):
+    return getattr(value, "value", value)
+
+
+def first_visit(bid):
+    """Start of the first cleaning: the morning after the contract was signed."""
+    signed_at = signed_time(bid)
+    return (signed_at + timedelta(days=1)).replace(hour=SERVICE_START_HOUR, minute=0, second=0, microsecond=0)
+
+
+def signed_time(bid):
+    """When the contract was signed; raises ValueError for a bid with no signed contract."""
+    timestamp = (bid.signed_contract or {}).get("timestamp")
+    if not timestamp:
+        raise ValueError(f"Bid {bid.bid_id} has no signed contract")
+    return datetime.fromisoformat(timestamp)
+
+
+def contract_event(business, client, bid, duration=SERVICE_DURATION):
+    """VEVENT for a signed contract, recurring according to the client's cleaning frequency."""
+    start = first_visit(bid)
+    event = Event()
+    event["uid"] = f"{bid.bid_id}@home-cleaners-assistant"
+    event.add("summary", f"Cleaning Service for {client.name}")
+    event.add("dtstart", start)
+    event.add("dtend", start + duration)
+    event.add("dtstamp", signed_time(bid))
+    event.add("location", bid.bid_address)
+    event.add("description", (
+        f"{business.business_name if business else ''}\n"
+        f"Contact: {client.contact_email} | {client.contact_number}\n"
+        "Confirmed via Home Cleaner's Assistant"
+    ))
+    rule = RECURRENCE_RULES.get(_value(client.cleaning_frequency))
+    if rule:
+        event.add("rrule", vRecur(rule))
+    return event
+
+
+def new_calendar(name=None):
+    cal = Calendar()
+    cal.add("prodid", PRODID)
+    cal.add("version", "2.0")
+    if name:
+        cal.add("x-wr-calname", name)
+    return cal
+
+
+def generate_ics(business, client, bid):
+    """A one-event calendar file for a single contract."""
+    cal = new_calendar()
+    cal.add_component(contract_event(business, client, bid))
+    return cal.to_ical()
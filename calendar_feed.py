@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import secrets
+
+from cache import LRUCache
+from database import db
+from utils.calendar import contract_event, new_calendar
+
+CALENDAR_FEED_CACHE_SIZE = int(os.getenv("CALENDAR_FEED_CACHE_SIZE", "1024"))
+CALENDAR_EVENT_CACHE_SIZE = int(os.getenv("CALENDAR_EVENT_CACHE_SIZE", "20000"))
+
+# A cached feed stays valid until one of these collections changes for its owner
+FEED_COLLECTIONS = ("business_profiles", "clients", "bids")
+
+_END = b"END:VCALENDAR\r\n"
+
+
+def _value(value):
+    return getattr(value, "value", value)
+
+
+def event_fingerprint(business, client, bid):
+    """Digest of every field that ends up in a contract's VEVENT."""
+    fields = [
+        bid.bid_id, bid.bid_address, bid.signed_contract.get("timestamp"),
+        client.name, client.contact_email, client.contact_number, _value(client.cleaning_frequency),
+        business.business_name if business else None,
+    ]
+    return hashlib.sha256(json.dumps(fields).encode()).hexdigest()
+
+
+class CalendarFeeds:
+    """Per-owner subscribable feeds of recurring cleanings for every signed contract.
+
+    A cached feed is checked against the owner's version counters, so a
+    change made through any worker is picked up on the next poll. A rebuild
+    reuses the serialized VEVENT of every contract whose fingerprint is
+    unchanged, so only edited contracts are re-rendered. The ETag is derived
+    from those fingerprints.
+    """
+
+    def __init__(self):
+        self._feeds = LRUCache(maxsize=CALENDAR_FEED_CACHE_SIZE)  # uid -> (versions, etag, body)
+        self._events = LRUCache(maxsize=CALENDAR_EVENT_CACHE_SIZE)  # fingerprint -> VEVENT bytes
+        self.builds = 0
+
+    @staticmethod
+    def _versions(uid):
+        return tuple(db["versions"].get(uid, c) for c in FEED_COLLECTIONS)
+
+    def cached(self, uid):
+        entry = self._feeds.get(uid)
+        if entry and entry[0] == self._versions(uid):
+            return entry[1:]
+        return None
+
+    def feed(self, uid):
+        """(etag, ics bytes) for the owner's feed, rebuilt only when something in it changed."""
+        return self.cached(uid) or self.build(uid)
+
+    def build(self, uid):
+        # Read the versions first: a write racing the rebuild leaves them stale, forcing another
+        versions = self._versions(uid)
+        business = db["business_profiles"].get(uid)
+        clients = {c.client_id: c for c in db["clients"].for_owner(uid)}
+        digest = hashlib.sha256()
+        chunks = []
+        for bid in db["bids"].for_owner(uid):
+            client = clients.get(bid.client_id)
+            if not bid.signed_contract or not client:
+                continue
+            fingerprint = event_fingerprint(business, client, bid)
+            chunk = self._events.get(fingerprint)
+            if chunk is None:
+                chunk = contract_event(business, client, bid).to_ical()
+                self._events.set(fingerprint, chunk)
+            digest.update(fingerprint.encode())
+            chunks.append(chunk)
+        name = f"{business.business_name} cleanings" if business else "Cleanings"
+        digest.update(name.encode())
+        head = new_calendar(name).to_ical()[:-len(_END)]
+        result = (f'"{digest.hexdigest()[:32]}"', head + b"".join(chunks) + _END)
+        self._feeds.set(uid, (versions, *result))
+        self.builds += 1
+        return result
+
+    def stats(self):
+        return {"builds": self.builds, "feeds": self._feeds.stats(), "events": self._events.stats()}
+
+
+calendar_feeds = CalendarFeeds()
+
+
+def feed_token(uid, rotate=False):
+    """The owner's feed token, created on first use; rotating revokes the old URL."""
+    tokens = db["calendar_tokens"]
+    token = tokens.get(f"owner:{uid}")
+    if token and not rotate:
+        return token
+    if token:
+        del tokens[f"token:{token}"]
+    token = secrets.token_urlsafe(24)
+    tokens[f"token:{token}"] = uid
+    tokens[f"owner:{uid}"] = token
+    return token
+
+
+def owner_for_token(token):
+    return db["calendar_tokens"].get(f"token:{token}")
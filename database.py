@@ -1,6 +1,276 @@
-db = {
-    "business_profiles": {},      # key = owner_id, value = BusinessProfile
-    "clients": {},         # key = owner_id, value = list of Client
-    "bids": {},          # key = owner_id, value = list of Bid
-    "subscriptions": {}  # key = uid, value = "free" or "pro"
-}
\ No newline at end of file
+import os
+import uuid
+from bisect import bisect_right
+from itertools import count, islice
+
+from records import bid_record, client_record
+
+
+class SeqIndex:
+    """Keys in insertion order, tagged with the sequence number they were added at.
+
+    Cursors are sequence numbers, so resuming a page is a bisect rather than a
+    scan. Removed keys are skipped lazily and compacted once they pile up.
+    """
+
+    def __init__(self):
+        self._seqs = []
+        self._keys = []
+        self._live = {}  # key = record key, value = seq
+
+    def add(self, key, seq):
+        if key in self._live:
+            return self._live[key]
+        if self._seqs and seq < self._seqs[-1]:
+            # A record moving between secondary indexes keeps its original seq
+            i = bisect_right(self._seqs, seq)
+            self._seqs.insert(i, seq)
+            self._keys.insert(i, key)
+        else:
+            self._seqs.append(seq)
+            self._keys.append(key)
+        self._live[key] = seq
+        return seq
+
+    def discard(self, key):
+        if self._live.pop(key, None) is None:
+            return
+        if len(self._keys) > 2 * len(self._live) + 64:
+            pairs = [(s, k) for s, k in zip(self._seqs, self._keys) if self._live.get(k) == s]
+            # Fresh lists, so generators already walking the old ones stay valid
+            self._seqs = [s for s, _ in pairs]
+            self._keys = [k for _, k in pairs]
+
+    def after(self, seq=0):
+        seqs, keys = self._seqs, self._keys
+        for i in range(bisect_right(seqs, seq), len(seqs)):
+            if self._live.get(keys[i]) == seqs[i]:
+                yield seqs[i], keys[i]
+
+    def __len__(self):
+        return len(self._live)
+
+
+class Versions:
+    """Change counters per (owner_id, collection), the basis for list and profile ETags.
+
+    The epoch is new for every in-memory store, so counters restarting from
+    zero after a restart never reproduce an ETag handed out earlier.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._versions = {}
+
+    def bump(self, owner_id, collection):
+        key = (owner_id, collection)
+        self._versions[key] = self._versions.get(key, 0) + 1
+        return self._versions[key]
+
+    def get(self, owner_id, collection):
+        return self._versions.get((owner_id, collection), 0)
+
+
+class VersionedMapping(dict):
+    """Owner-keyed dict (profiles, subscriptions) whose writes bump the owner's version."""
+
+    def __init__(self, versions, collection):
+        super().__init__()
+        self._versions = versions
+        self._collection = collection
+
+    def __setitem__(self, owner_id, value):
+        super().__setitem__(owner_id, value)
+        self._versions.bump(owner_id, self._collection)
+
+    def __delitem__(self, owner_id):
+        super().__delitem__(owner_id)
+        self._versions.bump(owner_id, self._collection)
+
+
+class ClientStore:
+    """ClientRecords indexed per owner by client_id, plus a secondary index by cleaning frequency."""
+
+    def __init__(self, versions=None):
+        self.versions = versions or Versions()
+        self._seq = count(1)
+        self._by_id = {}         # key = owner_id, value = {client_id: ClientRecord}
+        self._order = {}         # key = owner_id, value = SeqIndex of client_ids
+        self._by_frequency = {}  # key = owner_id, value = {frequency: {client_id: None}}
+
+    def add(self, client):
+        client = client_record(client)
+        clients = self._by_id.setdefault(client.owner_id, {})
+        previous = clients.get(client.client_id)
+        if previous:
+            self._unindex(previous)
+        clients[client.client_id] = client
+        self._order.setdefault(client.owner_id, SeqIndex()).add(client.client_id, next(self._seq))
+        frequencies = self._by_frequency.setdefault(client.owner_id, {})
+        frequencies.setdefault(client.cleaning_frequency, {})[client.client_id] = None
+        self.versions.bump(client.owner_id, "clients")
+        return client
+
+    def add_many(self, clients):
+        for client in clients:
+            self.add(client)
+
+    def get(self, owner_id, client_id):
+        return self._by_id.get(owner_id, {}).get(client_id)
+
+    def for_owner(self, owner_id):
+        return list(self._by_id.get(owner_id, {}).values())
+
+    def page(self, owner_id, after=0, limit=50):
+        """Up to ``limit`` (seq, client) pairs added after the ``after`` sequence number."""
+        clients = self._by_id.get(owner_id, {})
+        index = self._order.get(owner_id) or SeqIndex()
+        return [(seq, clients[key]) for seq, key in islice(index.after(after), limit)]
+
+    def with_frequency(self, owner_id, frequency):
+        clients = self._by_id.get(owner_id, {})
+        ids = self._by_frequency.get(owner_id, {}).get(frequency, {})
+        return [clients[client_id] for client_id in ids]
+
+    def remove(self, owner_id, client_id):
+        client = self._by_id.get(owner_id, {}).pop(client_id, None)
+        if client:
+            self._unindex(client)
+            self._order[owner_id].discard(client_id)
+            self.versions.bump(owner_id, "clients")
+        return client
+
+    def _unindex(self, client):
+        ids = self._by_frequency.get(client.owner_id, {}).get(client.cleaning_frequency)
+        if ids is not None:
+            ids.pop(client.client_id, None)
+
+
+class BidStore:
+    """BidRecords indexed per owner by bid_id, plus a secondary index by client_id."""
+
+    def __init__(self, versions=None):
+        self.versions = versions or Versions()
+        self._seq = count(1)
+        self._by_id = {}      # key = owner_id, value = {bid_id: BidRecord}
+        self._order = {}      # key = owner_id, value = SeqIndex of bid_ids
+        self._by_client = {}  # key = owner_id, value = {client_id: SeqIndex of bid_ids}
+
+    def add(self, bid):
+        bid = bid_record(bid)
+        bids = self._by_id.setdefault(bid.owner_id, {})
+        previous = bids.get(bid.bid_id)
+        if previous and previous.client_id != bid.client_id:
+            self._unindex(previous)
+        bids[bid.bid_id] = bid
+        # Re-adding an existing bid keeps its original position
+        seq = self._order.setdefault(bid.owner_id, SeqIndex()).add(bid.bid_id, next(self._seq))
+        self._by_client.setdefault(bid.owner_id, {}).setdefault(bid.client_id, SeqIndex()).add(bid.bid_id, seq)
+        self.versions.bump(bid.owner_id, "bids")
+        return bid
+
+    # Bid records are mutable, so an update is a re-add that refreshes the indexes
+    update = add
+
+    def add_many(self, bids):
+        for bid in bids:
+            self.add(bid)
+
+    def get(self, owner_id, bid_id):
+        return self._by_id.get(owner_id, {}).get(bid_id)
+
+    def for_owner(self, owner_id):
+        return list(self._by_id.get(owner_id, {}).values())
+
+    def for_client(self, owner_id, client_id):
+        bids = self._by_id.get(owner_id, {})
+        index = self._by_client.get(owner_id, {}).get(client_id) or SeqIndex()
+        return [bids[bid_id] for _, bid_id in index.after()]
+
+    def page(self, owner_id, after=0, limit=50, client_id=None):
+        """Up to ``limit`` (seq, bid) pairs added after the ``after`` sequence number."""
+        bids = self._by_id.get(owner_id, {})
+        if client_id is None:
+            index = self._order.get(owner_id)
+        else:
+            index = self._by_client.get(owner_id, {}).get(client_id)
+        index = index or SeqIndex()
+        return [(seq, bids[key]) for seq, key in islice(index.after(after), limit)]
+
+    def remove(self, owner_id, bid_id):
+        bid = self._by_id.get(owner_id, {}).pop(bid_id, None)
+        if bid:
+            self._unindex(bid)
+            self._order[owner_id].discard(bid_id)
+            self.versions.bump(owner_id, "bids")
+        return bid
+
+    def _unindex(self, bid):
+        index = self._by_client.get(bid.owner_id, {}).get(bid.client_id)
+        if index is not None:
+            index.discard(bid.bid_id)
+            if not index:
+                del self._by_client[bid.owner_id][bid.client_id]
+
+
+class EmailLog:
+    """Messages sent for each bid, keyed by (owner_id, bid_id)."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def append(self, owner_id, bid_id, entry):
+        self._entries.setdefault((owner_id, bid_id), []).append(entry)
+
+    def for_bid(self, owner_id, bid_id):
+        return list(self._entries.get((owner_id, bid_id), []))
+
+
+class RefCounts:
+    """Reference counts for shared blobs, keyed by path."""
+
+    def __init__(self):
+        self._counts = {}
+
+    def incr(self, key, amount=1):
+        self._counts[key] = self._counts.get(key, 0) + amount
+        return self._counts[key]
+
+    def decr(self, key, amount=1):
+        count = self._counts.get(key, 0) - amount
+        if count > 0:
+            self._counts[key] = count
+        else:
+            self._counts.pop(key, None)
+        return max(count, 0)
+
+    def get(self, key):
+        return self._counts.get(key, 0)
+
+
+def _memory_db():
+    versions = Versions()
+    return {
+        "business_profiles": VersionedMapping(versions, "business_profiles"),  # key = owner_id
+        "clients": ClientStore(versions),     # indexed by owner_id -> client_id
+        "bids": BidStore(versions),           # indexed by owner_id -> bid_id and client_id
+        "subscriptions": VersionedMapping(versions, "subscriptions"),  # key = uid, value = "free" or "pro"
+        "email_log": EmailLog(),      # indexed by (owner_id, bid_id)
+        "blob_refs": RefCounts(),     # key = blob path, value = reference count
+        "calendar_tokens": {},        # "owner:<uid>" -> feed token, "token:<token>" -> uid
+        "settings": {},               # server-wide values every worker must agree on
+        "versions": versions,         # change counters per (owner_id, collection)
+    }
+
+
+def _open_db():
+    # Setting HCA_DB_PATH switches to the durable SQLite backend, which is
+    # what lets several uvicorn workers share one data set
+    path = os.getenv("HCA_DB_PATH")
+    if not path:
+        return _memory_db()
+    from sqlite_store import open_sqlite_db
+    return open_sqlite_db(path, pool_size=int(os.getenv("HCA_DB_POOL_SIZE", "4")))
+
+
+db = _open_db()
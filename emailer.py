@@ -1,25 +1,151 @@
 import smtplib
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from email.message import EmailMessage
 
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+from executors import executors
+from metrics import span
+
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") != "0"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "3"))
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+SMTP_MAX_MESSAGES = int(os.getenv("SMTP_MAX_MESSAGES", "100"))
 GMAIL_USER = os.getenv("GMAIL_USER")
 GMAIL_PASS = os.getenv("GMAIL_APP_PASS")
 
-def send_email_with_attachment(to: str, subject: str, body: str, attachment_path: str):
+# Errors after which a pooled session is thrown away and the send retried once
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+class SMTPPool:
+    """A few authenticated SMTP sessions kept open and reused across sends.
+
+    Sessions are checked out one caller at a time, recycled after
+    max_messages or when idle longer than idle_seconds (servers drop them
+    anyway), and replaced transparently when the server disconnects.
+    """
+
+    def __init__(self, host=SMTP_SERVER, port=SMTP_PORT, user=GMAIL_USER, password=GMAIL_PASS,
+                 starttls=SMTP_STARTTLS, size=SMTP_POOL_SIZE, idle_seconds=SMTP_IDLE_SECONDS,
+                 max_messages=SMTP_MAX_MESSAGES):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.idle_seconds = idle_seconds
+        self.max_messages = max_messages
+        self.connects = 0
+        self.sent = 0
+        self._idle = queue.LifoQueue()  # (smtp, last_used, messages_sent)
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            smtp.starttls()
+        if self.user:
+            smtp.login(self.user, self.password)
+        self.connects += 1
+        return smtp
+
+    @staticmethod
+    def _close(smtp):
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def _checkout(self):
+        while True:
+            try:
+                smtp, last_used, count = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), 0
+            if time.monotonic() - last_used < self.idle_seconds:
+                return smtp, count
+            self._close(smtp)
+
+    @contextmanager
+    def session(self):
+        with self._slots:
+            smtp, count = self._checkout()
+            state = {"count": count}
+            try:
+                yield smtp, state
+            except BaseException:
+                self._close(smtp)
+                raise
+            if state["count"] >= self.max_messages:
+                self._close(smtp)
+            else:
+                self._idle.put((smtp, time.monotonic(), state["count"]))
+
+    def send_many(self, messages):
+        """Send messages back to back over one session, reconnecting once if it drops."""
+        pending = list(messages)
+        retried = False
+        while pending:
+            try:
+                with self.session() as (smtp, state):
+                    while pending:
+                        smtp.send_message(pending[0])
+                        pending.pop(0)
+                        state["count"] += 1
+                        self.sent += 1
+            except RECONNECT_ERRORS:
+                if retried:
+                    raise
+                retried = True
+
+    def send(self, message):
+        self.send_many([message])
+
+    def close(self):
+        while True:
+            try:
+                smtp, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(smtp)
+
+    def stats(self):
+        return {"connects": self.connects, "sent": self.sent, "idle": self._idle.qsize()}
+
+
+smtp_pool = SMTPPool()
+
+
+def build_message(to: str, subject: str, body: str, attachment, filename: str = None):
+    """EmailMessage with a PDF attachment given as bytes or a file path."""
     msg = EmailMessage()
     msg["From"] = GMAIL_USER
     msg["To"] = to
     msg["Subject"] = subject
     msg.set_content(body)
 
-    with open(attachment_path, "rb") as f:
-        data = f.read()
-        filename = os.path.basename(attachment_path)
+    if isinstance(attachment, (bytes, bytearray)):
+        data = bytes(attachment)
+        filename = filename or "attachment.pdf"
+    else:
+        with open(attachment, "rb") as f:
+            data = f.read()
+        filename = filename or os.path.basename(attachment)
     msg.add_attachment(data, maintype="application", subtype="pdf", filename=filename)
+    return msg
+
+
+def send_email_with_attachment(to: str, subject: str, body: str, attachment_path, filename: str = None):
+    smtp_pool.send(build_message(to, subject, body, attachment_path, filename))
+
 
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as smtp:
-        smtp.starttls()
-        smtp.login(GMAIL_USER, GMAIL_PASS)
-        smtp.send_message(msg)
\ No newline at end of file
+async def send_email_async(to: str, subject: str, body: str, attachment, filename: str = None):
+    """Send through the pooled sessions without blocking the event loop."""
+    message = await executors.run_io(build_message, to, subject, body, attachment, filename)
+    with span("send_email"):
+        await executors.run_io(smtp_pool.send, message)
@@ -0,0 +1,91 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from fastapi import HTTPException
+
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(os.cpu_count() or 2)))
+IO_POOL_WORKERS = int(os.getenv("IO_POOL_WORKERS", "16"))
+CPU_QUEUE_LIMIT = int(os.getenv("CPU_QUEUE_LIMIT", str(max(CPU_POOL_WORKERS, 1) * 8)))
+CPU_TASK_TIMEOUT = float(os.getenv("CPU_TASK_TIMEOUT", "30"))
+QUEUE_WAIT_TIMEOUT = float(os.getenv("QUEUE_WAIT_TIMEOUT", "10"))
+
+
+def _release_soon(loop, slots):
+    try:
+        loop.call_soon_threadsafe(slots.release)
+    except RuntimeError:
+        pass  # the loop is closed, and its semaphore with it
+
+
+class Executors:
+    """Process pool for PDF rendering and OpenCV, thread pool for blocking I/O.
+
+    CPU work is admitted through a bounded queue: callers wait up to
+    QUEUE_WAIT_TIMEOUT for a slot and get a 503 when the pool is saturated,
+    and each task gets a 504 once it runs past its timeout. A task holds
+    its slot until it actually finishes, even after its caller got the 504. Setting
+    CPU_POOL_WORKERS=0 runs CPU work on the thread pool instead.
+    """
+
+    def __init__(self, cpu_workers=CPU_POOL_WORKERS, io_workers=IO_POOL_WORKERS, queue_limit=CPU_QUEUE_LIMIT):
+        self.cpu_workers = cpu_workers
+        self.io_workers = io_workers
+        self.queue_limit = queue_limit
+        self._cpu = None
+        self._io = None
+        self._slots = None
+
+    @property
+    def started(self):
+        return self._io is not None
+
+    def start(self):
+        if self.started:
+            return
+        self._io = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="io")
+        if self.cpu_workers > 0:
+            # spawn keeps children free of the parent's threads and open connections
+            self._cpu = ProcessPoolExecutor(
+                max_workers=self.cpu_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        self._slots = asyncio.Semaphore(self.queue_limit)
+
+    def shutdown(self, wait=True):
+        if self._cpu:
+            self._cpu.shutdown(wait=wait, cancel_futures=True)
+        if self._io:
+            self._io.shutdown(wait=wait, cancel_futures=True)
+        self._cpu = self._io = self._slots = None
+
+    async def run_cpu(self, fn, *args, timeout=CPU_TASK_TIMEOUT, **kwargs):
+        self.start()
+        slots = self._slots
+        try:
+            await asyncio.wait_for(slots.acquire(), QUEUE_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Server busy, try again shortly")
+        loop = asyncio.get_running_loop()
+        try:
+            future = (self._cpu or self._io).submit(partial(fn, *args, **kwargs))
+        except BaseException:
+            slots.release()
+            raise
+        # The slot is held until the pool is done with the task, not until the
+        # caller stops waiting: a timed-out task that is still running keeps a
+        # worker busy, so it must keep counting against the queue limit
+        future.add_done_callback(lambda _: _release_soon(loop, slots))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Processing timed out")
+
+    async def run_io(self, fn, *args, **kwargs):
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io, partial(fn, *args, **kwargs))
+
+
+executors = Executors()
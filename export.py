@@ -0,0 +1,144 @@
+import asyncio
+import os
+import zipfile
+
+from fastapi import HTTPException
+
+from database import db
+from executors import executors
+from pdf_cache import cached_contract_pdf, cached_estimate_pdf
+from utils.logger import log_event
+
+# Renders in flight per export; kept under the CPU queue limit so an export
+# waits for its own work instead of pushing other requests into 503s
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", str(max(executors.cpu_workers, 1) * 2)))
+EXPORT_DOCUMENTS = ("estimate", "contract")
+
+
+def select_bids(uid, client_id=None, signed=None, since=None, until=None, date_field="created"):
+    """The owner's bids matching every given filter, oldest first.
+
+    ``since``/``until`` are inclusive dates compared against the bid's
+    creation time, or its signing time when ``date_field`` is "signed";
+    bids without that timestamp are left out of date-filtered exports.
+    """
+    bids = db["bids"].for_client(uid, client_id) if client_id else db["bids"].for_owner(uid)
+    start = since.isoformat() if since else None
+    end = until.isoformat() if until else None
+    selected = []
+    for bid in bids:
+        if signed is not None and bool(bid.signed_contract) != signed:
+            continue
+        if start or end:
+            if date_field == "signed":
+                stamp = (bid.signed_contract or {}).get("timestamp")
+            else:
+                stamp = bid.created_at
+            day = stamp[:10] if stamp else None
+            if not day or (start and day < start) or (end and day > end):
+                continue
+        selected.append(bid)
+    return selected
+
+
+def export_jobs(uid, bids, documents=EXPORT_DOCUMENTS):
+    """(archive name, render coroutine function) for each document the bids can produce."""
+    business = db["business_profiles"].get(uid)
+    if not business:
+        raise HTTPException(status_code=400, detail="Business profile missing")
+    clients = {}
+    jobs = []
+    for bid in bids:
+        quote = bid.quote_data
+        if not quote:
+            continue
+        if "estimate" in documents:
+            jobs.append((f"estimates/{bid.bid_id}.pdf", _estimate(business, bid, quote, uid)))
+        if "contract" in documents:
+            if bid.client_id not in clients:
+                clients[bid.client_id] = db["clients"].get(uid, bid.client_id)
+            client = clients[bid.client_id]
+            if client:
+                jobs.append((f"contracts/{bid.bid_id}.pdf", _contract(business, client, bid, quote, uid)))
+    return jobs
+
+
+def _estimate(business, bid, quote, uid):
+    return lambda: cached_estimate_pdf(business, quote, slot=("estimate", uid, bid.bid_id))
+
+
+def _contract(business, client, bid, quote, uid):
+    return lambda: cached_contract_pdf(
+        business, client, bid, quote, client.cleaning_frequency, slot=("contract", uid, bid.bid_id)
+    )
+
+
+async def _named(name, render):
+    try:
+        return name, await render(), None
+    except Exception as e:
+        return name, None, e
+
+
+async def render_unordered(jobs, concurrency=EXPORT_CONCURRENCY):
+    """Yield (name, pdf bytes, error) as renders finish, with at most ``concurrency`` in flight."""
+    jobs = iter(jobs)
+    pending = set()
+    try:
+        while True:
+            for name, render in jobs:
+                pending.add(asyncio.ensure_future(_named(name, render)))
+                if len(pending) >= concurrency:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # The client went away or the stream failed: stop rendering for it
+        for task in pending:
+            task.cancel()
+
+
+class _ZipSink:
+    """Write-only buffer zipfile streams into; drained after every member."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_zip(jobs, uid=None, concurrency=EXPORT_CONCURRENCY):
+    """ZIP archive bytes, one chunk per document as soon as its render finishes.
+
+    Only the documents in flight are held in memory. A document that fails
+    to render is listed in errors.txt at the end of the archive instead of
+    breaking a response that has already started.
+    """
+    sink = _ZipSink()
+    errors = []
+    # Stored, not deflated: the PDFs are already compressed
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+        async for name, data, error in render_unordered(jobs, concurrency):
+            if error is not None:
+                errors.append(f"{name}: {getattr(error, 'detail', None) or error}")
+                continue
+            archive.writestr(name, data)
+            yield sink.drain()
+        if errors:
+            archive.writestr("errors.txt", "\n".join(errors) + "\n")
+            log_event(f"Export finished with {len(errors)} failed documents", level="warning",
+                      user_id=uid, count=len(errors))
+    yield sink.drain()
@@ -1,13 +1,191 @@
-import firebase_admin
-from firebase_admin import auth, credentials
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import time
+import urllib.request
+
 from fastapi import HTTPException
 
-cred = credentials.Certificate("firebase-creds.json")  # Download from Firebase Console
-firebase_admin.initialize_app(cred)
+from cache import LRUCache
+from executors import executors
+from metrics import span
+
+FIREBASE_CREDS_PATH = os.getenv("FIREBASE_CREDS_PATH", "firebase-creds.json")  # Download from Firebase Console
+FIREBASE_CERTS_URL = (
+    "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+)
+AUTH_VERIFIER = os.getenv("HCA_AUTH_VERIFIER", "firebase")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL", "3600"))
+MAX_UID_LENGTH = 128  # Firebase caps uids at 128 characters
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
 
-def verify_firebase_token(token: str):
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _token_header(token):
     try:
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Invalid Firebase token")
\ No newline at end of file
+        return json.loads(_b64decode(token.split(".", 1)[0]))
+    except ValueError:
+        raise ValueError("Malformed token")
+
+
+class KeySet:
+    """Firebase's public signing certificates, held in memory.
+
+    Refetched when the Cache-Control max-age runs out, or early when a
+    token names a key id we have not seen (i.e. Google rotated keys),
+    at most once per ``min_refresh`` seconds. Fetches run on the I/O pool,
+    one at a time; other lookups wait for them without blocking the loop.
+    """
+
+    def __init__(self, url=FIREBASE_CERTS_URL, min_refresh=60):
+        self.url = url
+        self.min_refresh = min_refresh
+        self._certs = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = None
+        self._lock_loop = None
+
+    def _fetch(self):
+        self._fetched_at = time.monotonic()
+        with urllib.request.urlopen(self.url, timeout=10) as response:
+            certs = json.loads(response.read())
+            cache_control = response.headers.get("Cache-Control", "")
+        match = re.search(r"max-age=(\d+)", cache_control)
+        self._certs = certs
+        self._expires_at = self._fetched_at + (int(match.group(1)) if match else 3600)
+
+    def _needs_fetch(self, kid):
+        now = time.monotonic()
+        stale = now >= self._expires_at
+        rotated = kid not in self._certs and now - self._fetched_at >= self.min_refresh
+        return stale or rotated
+
+    def _fetch_lock(self):
+        # asyncio locks belong to one loop; tests and load runs may start several
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        return self._lock
+
+    async def get(self, kid):
+        if self._needs_fetch(kid):
+            async with self._fetch_lock():
+                if self._needs_fetch(kid):
+                    await executors.run_io(self._fetch)
+        return self._certs.get(kid)
+
+
+class FirebaseVerifier:
+    """Verifies Firebase ID tokens against the cached public key set."""
+
+    def __init__(self, project_id=None, keys=None):
+        self._project_id = project_id or os.getenv("FIREBASE_PROJECT_ID")
+        self.keys = keys or KeySet()
+
+    @property
+    def project_id(self):
+        if not self._project_id:
+            with open(FIREBASE_CREDS_PATH) as f:
+                self._project_id = json.load(f)["project_id"]
+        return self._project_id
+
+    async def verify(self, token):
+        from google.auth import jwt
+
+        header = _token_header(token)
+        if header.get("alg") != "RS256":
+            raise ValueError("Unexpected signing algorithm")
+        cert = await self.keys.get(header.get("kid"))
+        if not cert:
+            raise ValueError("Unknown signing key")
+        claims = jwt.decode(token, certs={header["kid"]: cert}, audience=self.project_id)
+        if claims.get("iss") != f"https://securetoken.google.com/{self.project_id}":
+            raise ValueError("Unexpected issuer")
+        # The checks firebase_admin.auth.verify_id_token adds on top of the JWT ones
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > MAX_UID_LENGTH:
+            raise ValueError("Missing or invalid subject")
+        auth_time = claims.get("auth_time")
+        if not isinstance(auth_time, (int, float)) or auth_time > time.time():
+            raise ValueError("Missing or invalid auth_time")
+        claims["uid"] = subject
+        return claims
+
+
+class LocalVerifier:
+    """HS256 tokens signed with a local key set, for tests, benchmarks and load runs.
+
+    Keys come from HCA_LOCAL_AUTH_KEYS as a JSON object of key id to secret;
+    there is deliberately no default, so a deployment cannot start with a
+    secret anyone can read in this file.
+    """
+
+    def __init__(self, keys=None):
+        if keys is None:
+            keys = json.loads(os.getenv("HCA_LOCAL_AUTH_KEYS") or "{}")
+        if not keys or not all(isinstance(secret, str) and secret for secret in keys.values()):
+            raise RuntimeError("HCA_LOCAL_AUTH_KEYS must map key ids to non-empty secrets")
+        self.keys = keys
+
+    def issue(self, uid, kid=None, ttl=3600, **claims):
+        kid = kid or next(iter(self.keys))
+        now = int(time.time())
+        header = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT", "kid": kid}).encode())
+        payload = _b64encode(json.dumps({"sub": uid, "iat": now, "exp": now + ttl, **claims}).encode())
+        signature = hmac.new(self.keys[kid].encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        return f"{header}.{payload}.{_b64encode(signature)}"
+
+    async def verify(self, token):
+        header = _token_header(token)
+        secret = self.keys.get(header.get("kid"))
+        if header.get("alg") != "HS256" or not secret:
+            raise ValueError("Unknown signing key")
+        signing_input, _, signature = token.rpartition(".")
+        expected = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise ValueError("Bad signature")
+        claims = json.loads(_b64decode(signing_input.split(".")[1]))
+        subject = claims.get("sub")
+        if claims.get("exp", 0) <= time.time() or not isinstance(subject, str) or not subject \
+                or len(subject) > MAX_UID_LENGTH:
+            raise ValueError("Expired or incomplete token")
+        claims["uid"] = claims["sub"]
+        return claims
+
+
+VERIFIERS = {"firebase": FirebaseVerifier, "local": LocalVerifier}
+
+verifier = VERIFIERS[AUTH_VERIFIER]()
+token_cache = LRUCache(maxsize=TOKEN_CACHE_SIZE)
+
+
+async def verify_firebase_token(token: str):
+    """Claims for a bearer token, served from the verified-token cache until the token expires."""
+    with span("auth"):
+        if token.lower().startswith("bearer "):
+            token = token[7:]
+        token = token.strip()
+        key = hashlib.sha256(token.encode()).hexdigest()
+        claims = token_cache.get(key)
+        if claims is not None:
+            return claims
+        try:
+            claims = await verifier.verify(token)
+        except Exception as e:
+            raise HTTPException(status_code=401, detail="Invalid Firebase token")
+        ttl = min(claims.get("exp", 0) - time.time(), TOKEN_CACHE_MAX_TTL)
+        if ttl > 0:
+            token_cache.set(key, claims, ttl=ttl)
+        return claims
@@ -0,0 +1,109 @@
+import asyncio
+import glob
+import os
+import time
+
+from executors import executors
+from uploads import UPLOAD_DIR
+from utils.logger import log_event
+
+ARTIFACT_TTL_SECONDS = float(os.getenv("ARTIFACT_TTL_SECONDS", str(24 * 3600)))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(256 * 1024 * 1024)))
+# Younger files may still be in the middle of being written
+ARTIFACT_GRACE_SECONDS = float(os.getenv("ARTIFACT_GRACE_SECONDS", "300"))
+JANITOR_INTERVAL_SECONDS = float(os.getenv("JANITOR_INTERVAL_SECONDS", "600"))
+
+# Generated files nothing points at: PDFs from before rendering moved into
+# memory, the old on-disk PDF cache, and partial uploads left by a crash.
+# Blobs and signatures are referenced by bids and never match these.
+ARTIFACT_PATTERNS = (
+    "estimate_*.pdf",
+    "contract_*.pdf",
+    "pdf_cache/*.pdf",
+    "pdf_cache/.render_*.tmp",
+    "*.part",
+    "blobs/.upload_*.part",
+)
+
+
+class ArtifactJanitor:
+    """Deletes generated artifacts under uploads/ once they pass a TTL or a total size quota.
+
+    Oldest files go first when the quota is exceeded. Every worker may run
+    one; a file already removed by another is simply skipped.
+    """
+
+    def __init__(self, directory=UPLOAD_DIR, patterns=ARTIFACT_PATTERNS, ttl=ARTIFACT_TTL_SECONDS,
+                 max_bytes=ARTIFACT_MAX_BYTES, grace=ARTIFACT_GRACE_SECONDS, interval=JANITOR_INTERVAL_SECONDS):
+        self.directory = directory
+        self.patterns = patterns
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.grace = grace
+        self.interval = interval
+        self.removed = 0
+        self.reclaimed_bytes = 0
+        self._task = None
+
+    def _artifacts(self):
+        files = []
+        for pattern in self.patterns:
+            for path in glob.glob(os.path.join(self.directory, pattern)):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return sorted(files)
+
+    def sweep(self, now=None):
+        """Remove expired artifacts, then the oldest ones until the rest fit the quota."""
+        now = time.time() if now is None else now
+        files = self._artifacts()
+        total = sum(size for _, size, _ in files)
+        removed = reclaimed = 0
+        for mtime, size, path in files:
+            age = now - mtime
+            if age < self.grace or (age < self.ttl and total <= self.max_bytes):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            else:
+                removed += 1
+                reclaimed += size
+            total -= size
+        self.removed += removed
+        self.reclaimed_bytes += reclaimed
+        if removed:
+            log_event(f"Janitor removed {removed} artifacts", count=removed, bytes=reclaimed)
+        return {"removed": removed, "bytes": reclaimed, "remaining_bytes": total}
+
+    async def _run(self):
+        while True:
+            try:
+                await executors.run_io(self.sweep)
+            except Exception as e:
+                log_event("Janitor sweep failed", level="warning", error=e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self):
+        return {"removed": self.removed, "reclaimed_bytes": self.reclaimed_bytes}
+
+
+janitor = ArtifactJanitor()
@@ -0,0 +1,374 @@
+"""Offline load test: boots main:app under uvicorn with local auth and an SMTP sink.
+
+    python loadtest.py --concurrency 32 --duration 60
+    python loadtest.py --requests 5000 --workers 4 --output loadtest.json
+    python loadtest.py --mix quote=50,list_bids=30,estimate_pdf=20
+
+Tokens are signed by firebase_auth.LocalVerifier, so no Firebase project or
+network access is needed, and outgoing mail is accepted and discarded by a
+local SMTP sink. Each concurrent worker acts as its own business owner.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import cv2
+import httpx
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = {
+    "list_clients": 10,
+    "create_client": 5,
+    "delete_client": 2,
+    "list_bids": 10,
+    "get_bid": 8,
+    "create_bid": 8,
+    "create_bid_photos": 4,
+    "quote": 20,
+    "estimate_pdf": 10,
+    "contract_pdf": 8,
+    "email_estimate": 4,
+    "estimate_area": 6,
+}
+
+QUOTE_INPUT = {
+    "square_footage": 1850, "num_pets": 1, "num_windows": 12, "cleanliness": 3,
+    "travel_miles": 8, "state": "TX",
+}
+
+
+class SMTPSink:
+    """Just enough of an SMTP server to accept, count and drop every message."""
+
+    def __init__(self):
+        self.messages = 0
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._session, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _session(self, reader, writer):
+        writer.write(b"220 loadtest sink\r\n")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line[:4].upper()
+                if command == b"EHLO":
+                    writer.write(b"250-loadtest\r\n250-AUTH PLAIN LOGIN\r\n250 OK\r\n")
+                elif command == b"AUTH":
+                    writer.write(b"235 OK\r\n")
+                elif command == b"DATA":
+                    writer.write(b"354 End with <CRLF>.<CRLF>\r\n")
+                    await writer.drain()
+                    while await reader.readline() not in (b".\r\n", b""):
+                        pass
+                    self.messages += 1
+                    writer.write(b"250 OK\r\n")
+                elif command == b"QUIT":
+                    writer.write(b"221 Bye\r\n")
+                    break
+                else:
+                    writer.write(b"250 OK\r\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _room_photos(count=4):
+    rng = np.random.default_rng(0)
+    photos = []
+    for _ in range(count):
+        image = np.full((1536, 2048, 3), 200, np.uint8)
+        x, y = int(rng.integers(100, 600)), int(rng.integers(100, 400))
+        cv2.rectangle(image, (x, y), (x + 1200, y + 800), (40, 40, 40), -1)
+        image = cv2.add(image, rng.integers(0, 16, image.shape, dtype=np.uint8))
+        photos.append(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+    return photos
+
+
+class Owner:
+    """One simulated business owner and the records it has created so far."""
+
+    def __init__(self, uid, token):
+        self.uid = uid
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.clients = []  # created during setup; bids are only placed against these
+        self.spare_clients = []  # created by the create_client scenario, safe to delete
+        self.bids = []  # (client_id, bid_id)
+
+
+class LoadTest:
+    def __init__(self, base_url, owners, mix, photos, seed=0):
+        self.base_url = base_url
+        self.owners = owners
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.photos = photos
+        self.random = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def setup(self, http, owner):
+        await http.post("/set-subscription", headers=owner.headers, data={"level": "pro"})
+        await http.post("/profile", headers=owner.headers, data={
+            "business_name": f"Cleaner {owner.uid}", "business_address": "1 Main St",
+            "contact_email": "owner@example.com", "contact_number": "555-0100",
+        })
+        for _ in range(3):
+            await self.create_client(http, owner)
+        owner.clients, owner.spare_clients = owner.spare_clients, []
+        for _ in range(2):
+            await self.create_bid(http, owner)
+
+    async def create_client(self, http, owner):
+        response = await http.post("/client", headers=owner.headers, data={
+            "name": "Jamie Client", "contact_email": "client@example.com",
+            "contact_number": "555-0199", "cleaning_frequency": self.random.choice(["single", "bimonthly", "weekly"]),
+        })
+        if response.status_code == 200:
+            owner.spare_clients.append(response.json()["client"]["client_id"])
+        return response
+
+    async def delete_client(self, http, owner):
+        if not owner.spare_clients:
+            return await self.create_client(http, owner)
+        return await http.delete(f"/client/{owner.spare_clients.pop()}", headers=owner.headers)
+
+    async def list_clients(self, http, owner):
+        return await http.get("/clients", headers=owner.headers, params={"limit": 50})
+
+    async def list_bids(self, http, owner):
+        return await http.get("/bids", headers=owner.headers, params={"limit": 50, "exclude": "quote_data"})
+
+    async def get_bid(self, http, owner):
+        _, bid_id = self.random.choice(owner.bids)
+        return await http.get(f"/bids/{bid_id}", headers=owner.headers)
+
+    async def create_bid(self, http, owner, photos=()):
+        client_id = self.random.choice(owner.clients)
+        files = [("before_photos", (f"room{i}.jpg", photo, "image/jpeg")) for i, photo in enumerate(photos)]
+        response = await http.post("/bid", headers=owner.headers, files=files or None, data={
+            "client_id": client_id, "bid_address": "2 Elm St", "notes": "Two dogs.",
+            "total_sqft": self.random.randint(600, 4000), "num_pets": self.random.randint(0, 3),
+            "num_windows": self.random.randint(4, 30), "cleanliness": self.random.randint(1, 5),
+            "travel_miles": self.random.randint(1, 25), "state": "TX",
+        })
+        if response.status_code == 200:
+            owner.bids.append((client_id, response.json()["bid"]["bid_id"]))
+        return response
+
+    async def create_bid_photos(self, http, owner):
+        return await self.create_bid(http, owner, self.random.sample(self.photos, 2))
+
+    async def quote(self, http, owner):
+        return await http.post("/calculate-quote", headers=owner.headers, json={
+            **QUOTE_INPUT, "square_footage": self.random.randint(600, 4000),
+        })
+
+    async def estimate_pdf(self, http, owner):
+        _, bid_id = self.random.choice(owner.bids)
+        return await http.post(f"/generate-estimate/{bid_id}", headers=owner.headers)
+
+    async def contract_pdf(self, http, owner):
+        client_id, bid_id = self.random.choice(owner.bids)
+        return await http.get(f"/generate-contract/{client_id}/{bid_id}", headers=owner.headers)
+
+    async def email_estimate(self, http, owner):
+        _, bid_id = self.random.choice(owner.bids)
+        return await http.post(f"/email-estimate/{bid_id}", headers=owner.headers, data={"to": "client@example.com"})
+
+    async def estimate_area(self, http, owner):
+        photo = self.random.choice(self.photos)
+        return await http.post("/estimate-area", headers=owner.headers,
+                               files={"photo": ("room.jpg", photo, "image/jpeg")})
+
+    async def _worker(self, http, owner, deadline, budget):
+        while time.monotonic() < deadline and budget["remaining"] > 0:
+            budget["remaining"] -= 1
+            name = self.random.choices(self.names, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await getattr(self, name)(http, owner)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            self.latencies[name].append(time.perf_counter() - start)
+            if failed:
+                self.errors[name] += 1
+
+    async def run(self, concurrency, duration, requests):
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=120, limits=limits) as http:
+            await asyncio.gather(*(self.setup(http, owner) for owner in self.owners))
+            budget = {"remaining": requests or float("inf")}
+            deadline = time.monotonic() + (duration or float("inf"))
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                self._worker(http, self.owners[i % len(self.owners)], deadline, budget) for i in range(concurrency)
+            ))
+            return time.perf_counter() - start
+
+
+def summarize(latencies, errors, elapsed):
+    """Per-scenario count, error count, throughput and latency percentiles in milliseconds."""
+    report = {}
+    everything = []
+    for name, samples in sorted(latencies.items()):
+        everything += samples
+        report[name] = _stats(samples, errors.get(name, 0), elapsed)
+    report["TOTAL"] = _stats(everything, sum(errors.values()), elapsed)
+    return report
+
+
+def _stats(samples, errors, elapsed):
+    samples = sorted(samples) or [0.0]
+    cuts = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / elapsed, 2),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+def _parse_mix(text):
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _start_server(workdir, port, smtp_port, keys, args):
+    for folder in ("uploads", "static", "templates"):
+        os.makedirs(os.path.join(workdir, folder), exist_ok=True)
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])),
+        "HCA_AUTH_VERIFIER": "local",
+        "HCA_LOCAL_AUTH_KEYS": json.dumps(keys),
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_STARTTLS": "0",
+        "GMAIL_USER": "loadtest@example.com",
+        "GMAIL_APP_PASS": "loadtest",
+    }
+    if args.db:
+        env["HCA_DB_PATH"] = os.path.abspath(args.db)
+    elif args.workers > 1:
+        # Worker processes only see each other's writes through a shared database
+        env["HCA_DB_PATH"] = os.path.join(workdir, "loadtest.sqlite3")
+    else:
+        env.pop("HCA_DB_PATH", None)
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(command, cwd=workdir, env=env)
+
+
+async def _wait_ready(base_url, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise SystemExit(f"server exited with status {server.returncode}")
+            try:
+                if (await http.get("/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit("server did not become ready")
+
+
+async def run(args):
+    mix = _parse_mix(args.mix)
+    keys = {"loadtest": secrets.token_hex(16)}
+    os.environ["LOG_DIR"] = os.path.join(args.workdir, "logs")
+    sys.path.insert(0, REPO_DIR)
+    from firebase_auth import LocalVerifier
+
+    verifier = LocalVerifier(keys)
+    sink = SMTPSink()
+    await sink.start()
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = _start_server(args.workdir, port, sink.port, keys, args)
+    try:
+        await _wait_ready(base_url, server)
+        owners = [Owner(f"loadtest-{i}", verifier.issue(f"loadtest-{i}")) for i in range(args.owners or args.concurrency)]
+        test = LoadTest(base_url, owners, mix, _room_photos(), seed=args.seed)
+        elapsed = await test.run(args.concurrency, args.duration, args.requests)
+    finally:
+        server.terminate()
+        # Keep serving the sink while the app's shutdown closes its SMTP sessions
+        await asyncio.to_thread(server.wait, 30)
+        await sink.stop()
+    report = summarize(test.latencies, test.errors, elapsed)
+    return {"elapsed_s": round(elapsed, 2), "concurrency": args.concurrency, "workers": args.workers,
+            "emails_received": sink.messages, "routes": report}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16, help="simultaneous in-flight requests")
+    parser.add_argument("--owners", type=int, help="distinct business owners (default: one per worker)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run; 0 runs until --requests")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--mix", help="scenario weights, e.g. quote=50,list_bids=30 (default: built-in mix)")
+    parser.add_argument("--db", help="SQLite file for HCA_DB_PATH (default: in-memory with one worker)")
+    parser.add_argument("--workdir", help="server working directory (default: a temporary directory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="hca-loadtest-") as tmp:
+        args.workdir = os.path.abspath(args.workdir or tmp)
+        result = asyncio.run(run(args))
+
+    print(f"{'route':20} {'count':>7} {'errors':>6} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, row in result["routes"].items():
+        print(f"{name:20} {row['count']:7} {row['errors']:6} {row['rps']:8.1f} "
+              f"{row['p50_ms']:7.1f}ms {row['p95_ms']:7.1f}ms {row['p99_ms']:7.1f}ms")
+    print(f"\n{result['elapsed_s']}s, {result['emails_received']} emails delivered to the sink")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 1 if result["routes"]["TOTAL"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
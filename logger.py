@@ -1,28 +1,143 @@
+import atexit
+import copy
+import glob
+import json
 import logging
 import os
+import queue
+import re
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 
-# Ensure logs folder exists
-os.makedirs("logs", exist_ok=True)
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+# One file per process: uvicorn workers and pool processes each rotate only
+# their own file, since rotating a shared file from several processes loses
+# records. Ship or tail logs/app-*.log.
+LOG_FILE = os.path.join(LOG_DIR, f"app-{os.getpid()}.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN")  # e.g. "midnight"; unset rotates by size
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Files left by exited processes (restarts, recycled workers) are kept up to
+# this total, newest first; live processes are bounded by their own rotation
+LOG_STALE_MAX_BYTES = int(os.getenv("LOG_STALE_MAX_BYTES", str(LOG_MAX_BYTES * (LOG_BACKUP_COUNT + 1))))
 
-# Configure global logging
-logging.basicConfig(
-    filename="logs/app.log",
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
+LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "critical": logging.CRITICAL,
+}
 
-def log_event(message: str, level: str = "info", user_id: str = None, error: Exception = None):
-    """Flexible logging function with optional user and error context"""
-    prefix = f"[UID: {user_id}] " if user_id else ""
-    content = f"{prefix}{message}"
 
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, message and any structured fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "pid": record.process,
+            "level": record.levelname.lower(),
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Enqueue without ever blocking the caller; records are counted and dropped when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # The base class flattens and drops exc_info; keep the traceback as a field instead
+        if record.exc_info:
+            fields = dict(getattr(record, "fields", None) or {})
+            fields["traceback"] = "".join(traceback.format_exception(*record.exc_info))
+            record = copy.copy(record)
+            record.fields = fields
+            record.exc_info = record.exc_text = None
+        return super().prepare(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def prune_stale_logs(directory=LOG_DIR, max_bytes=LOG_STALE_MAX_BYTES):
+    """Delete the oldest log files of exited processes until they fit ``max_bytes``."""
+    stale = []
+    for path in glob.glob(os.path.join(directory, "app-*.log*")):
+        match = re.match(r"app-(\d+)\.log", os.path.basename(path))
+        if not match or _alive(int(match.group(1))):
+            continue
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        stale.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in stale)
+    for _, size, path in sorted(stale):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _file_handler():
+    os.makedirs(LOG_DIR, exist_ok=True)
+    prune_stale_logs()
+    # delay: processes that never log (most pool workers) leave no empty file behind
+    if LOG_ROTATE_WHEN:
+        handler = TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, utc=True, delay=True
+        )
+    else:
+        handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True)
+    handler.setFormatter(JSONFormatter())
+    return handler
+
+
+logger = logging.getLogger("hca")
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+
+_queue = queue.Queue(LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(_queue)
+logger.addHandler(queue_handler)
+
+# The file is only ever written from the listener's thread
+listener = QueueListener(_queue, _file_handler(), respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
+
+
+def log_event(message: str, level: str = "info", user_id: str = None, error: Exception = None, **fields):
+    """Queue a structured log line; extra keyword arguments (route, bid_id, duration_ms, ...) become JSON fields."""
+    levelno = LEVELS.get(level, logging.INFO)
+    if not logger.isEnabledFor(levelno):
+        return
+    if user_id:
+        fields["uid"] = user_id
     if error:
-        content += f" | Exception: {str(error)}"
-
-    {
-        "info": logging.info,
-        "warning": logging.warning,
-        "error": logging.error,
-        "debug": logging.debug,
-        "critical": logging.critical,
-    }.get(level, logging.info)(content)
\ No newline at end of file
+        fields["error"] = str(error)
+        fields["error_type"] = type(error).__name__
+    logger.log(levelno, message, extra={"fields": fields})
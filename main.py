@@ -1,28 +1,60 @@
 import os
+import time
 import uuid
-import shutil
+import hashlib
+import asyncio
 import datetime
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
 
-from fastapi import FastAPI, Header, UploadFile, File, Form, Request, HTTPException, Body
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, Header, UploadFile, File, Form, Request, HTTPException, Body, Query
+from fastapi.responses import Response, JSONResponse, FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 
 from firebase_auth import verify_firebase_token
-from models import BusinessProfile, Client, Bid, CleaningFrequency
+from models import BusinessProfile, Client, Bid, CleaningFrequency, RateCard
 from database import db
-from pdf_generator import generate_contract_pdf, generate_estimate_pdf
-from quote_engine import calculate_quote
-from square_footage_estimator import estimate_area_from_image
+from executors import executors
+import metrics
+from uploads import MAX_REQUEST_BYTES, UploadBudget, read_upload, save_upload
+from blob_store import (
+    THUMBNAIL_SIZES, find_blob, gather_stored, release, retain, store_upload, store_uploads, thumbnail_path,
+)
+from photo_links import owner_references, signed_photo_url, valid_signature
+from pagination import PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, dump_records, parse_projection, fetch_page, stream_ndjson
+from pdf_cache import pdf_cache, cached_contract_pdf, cached_estimate_pdf
+from branding import brand_cache
+from janitor import janitor
+from export import EXPORT_DOCUMENTS, export_jobs, select_bids, stream_zip
+from quote_engine import (
+    calculate_quote, calculate_quotes, compile_rate_card, normalize_quote_input, price_sweep, quote_cache, quote_columns,
+    quote_rows,
+)
+from rate_cards import rate_cards
+from area_cache import area_cache, cached_area_estimate
+from calendar_feed import calendar_feeds, feed_token, owner_for_token
 from auth_helpers import require_subscription
 from utils.logger import log_event
-from utils.emailer import send_email_with_attachment
+from utils.emailer import send_email_async, smtp_pool
 from utils.calendar import generate_ics
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    executors.start()
+    janitor.start()
+    yield
+    await janitor.stop()
+    await executors.run_io(smtp_pool.close)
+    await executors.run_io(area_cache.save)
+    executors.shutdown()
+    if "pool" in db:
+        db["pool"].close()
+
 app = FastAPI(
+    lifespan=lifespan,
     docs_url=None,
     openapi_url="/openapi.json",
     openapi_version="3.0.3"
@@ -67,6 +99,7 @@ def custom_openapi():
         {"name": "Bids"},
         {"name": "Estimates"},
         {"name": "Contracts"},
+        {"name": "Export"},
         {"name": "Subscriptions"},
         {"name": "Email"},
         {"name": "Calendar"},
@@ -77,10 +110,70 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
-def get_uid_from_header(auth: Optional[str]) -> str:
+# Reject oversized bodies before multipart parsing spools them to disk;
+# the per-file and per-request limits are enforced again while saving
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_REQUEST_BYTES + 1024 * 1024:
+        return JSONResponse(status_code=413, content={"detail": "Request too large"})
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.observe_request(
+            request.method, route.path if route else "unmatched", status,
+            time.perf_counter() - start, getattr(request.state, "uid", None),
+        )
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(authorization: Optional[str] = Header(None)):
+    if metrics.METRICS_TOKEN and authorization != f"Bearer {metrics.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def get_uid_from_header(auth: Optional[str]) -> str:
     if not auth:
         raise HTTPException(status_code=401, detail="Missing Authorization Header")
-    return verify_firebase_token(auth)["uid"]
+    return (await verify_firebase_token(auth))["uid"]
+
+def quote_for(uid: str, form_data: dict) -> dict:
+    """The owner's price for ``form_data``; malformed quote input is the client's error."""
+    try:
+        return calculate_quote(form_data, rate_cards.evaluator(uid))
+    except (KeyError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid quote input: {e}")
+
+def collection_etag(request: Request, uid: str, *collections: str) -> str:
+    """Strong ETag for a view of the owner's collections, from version counters alone."""
+    versions = db["versions"]
+    state = ".".join(str(versions.get(uid, c)) for c in collections)
+    view = f"{uid}/{'+'.join(collections)}?{request.url.query}"
+    view = hashlib.blake2b(view.encode(), digest_size=8).hexdigest()
+    return f'"{versions.epoch}-{state}-{view}"'
+
+def not_modified(request: Request, etag: str):
+    """A 304 response when the client's If-None-Match already names ``etag``."""
+    tags = request.headers.get("if-none-match")
+    if tags and (tags.strip() == "*" or etag in [t.strip() for t in tags.split(",")]):
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
+
+def pdf_response(data: bytes, filename: str) -> Response:
+    return Response(data, media_type="application/pdf",
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+def etag_headers(etag: str) -> dict:
+    # no-cache makes browsers revalidate with If-None-Match instead of guessing freshness
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
 
 # --- CLIENTS ---
 @app.post("/client", tags=["Clients"])
@@ -91,7 +184,7 @@ async def add_client(
     contact_number: str = Form(...),
     cleaning_frequency: CleaningFrequency = Form(...)
 ):
-    uid = get_uid_from_header(authorization)
+    uid = await get_uid_from_header(authorization)
     client_id = str(uuid.uuid4())
     client = Client(
         client_id=client_id,
@@ -101,23 +194,46 @@ async def add_client(
         contact_number=contact_number,
         cleaning_frequency=cleaning_frequency
     )
-    db["clients"].setdefault(uid, []).append(client)
-    log_event(f"Client created: {client_id}", user_id=uid)
+    db["clients"].add(client)
+    log_event(f"Client created: {client_id}", user_id=uid, client_id=client_id)
     return {"status": "client added", "client": client.dict()}
 
 @app.get("/clients", tags=["Clients"])
-async def list_clients(authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
-    return [c.dict() for c in db["clients"].get(uid, [])]
+async def list_clients(
+    request: Request,
+    response: Response,
+    authorization: str = Header(...),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None,
+    stream: bool = False
+):
+    uid = await get_uid_from_header(authorization)
+    etag = collection_etag(request, uid, "clients")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers.update(etag_headers(etag))
+    include, skip = parse_projection(Client, fields, exclude)
+    after = decode_cursor(cursor)
+
+    def page(after, limit):
+        return db["clients"].page(uid, after=after, limit=limit)
+
+    if stream:
+        return StreamingResponse(stream_ndjson(page, after, limit, include, skip), media_type="application/x-ndjson",
+                                 headers=etag_headers(etag))
+    if limit or cursor:
+        return fetch_page(page, after, limit or PAGE_SIZE, include, skip)
+    clients = db["clients"].for_owner(uid)
+    return Response(dump_records(clients, include, skip), media_type="application/json", headers=etag_headers(etag))
 
 @app.delete("/client/{client_id}", tags=["Clients"])
 async def delete_client(client_id: str, authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
-    db["clients"][uid] = [
-        c for c in db["clients"].get(uid, [])
-        if c.client_id != client_id
-    ]
-    log_event(f"Client deleted: {client_id}", user_id=uid)
+    uid = await get_uid_from_header(authorization)
+    db["clients"].remove(uid, client_id)
+    log_event(f"Client deleted: {client_id}", user_id=uid, client_id=client_id)
     return {"status": "client deleted"}
 
 # --- BUSINESS PROFILE ---
@@ -133,15 +249,15 @@ async def save_profile(
     qr_venmo: UploadFile = File(None),
     qr_paypal: UploadFile = File(None)
 ):
-    uid = get_uid_from_header(authorization)
-    def save_file(uploaded, prefix):
-        if uploaded:
-            path = f"uploads/{prefix}_{uuid.uuid4()}.png"
-            with open(path, "wb") as f:
-                shutil.copyfileobj(uploaded.file, f)
-            return path
-        return None
+    uid = await get_uid_from_header(authorization)
+    budget = UploadBudget()
+    logo_url, qr_venmo_url, qr_paypal_url = await gather_stored(
+        store_upload(logo, budget),
+        store_upload(qr_venmo, budget),
+        store_upload(qr_paypal, budget),
+    )
 
+    previous = db["business_profiles"].get(uid)
     profile = BusinessProfile(
         owner_id=uid,
         owner_name=owner_name,
@@ -149,17 +265,27 @@ async def save_profile(
         business_address=business_address,
         contact_email=contact_email,
         contact_number=contact_number,
-        logo_url=save_file(logo, "logo"),
-        qr_venmo_url=save_file(qr_venmo, "venmo"),
-        qr_paypal_url=save_file(qr_paypal, "paypal"),
+        logo_url=logo_url,
+        qr_venmo_url=qr_venmo_url,
+        qr_paypal_url=qr_paypal_url,
+        rate_card=previous and previous.rate_card,
     )
     db["business_profiles"][uid] = profile
+    brand_cache.invalidate(uid)
+    retain(logo_url, qr_venmo_url, qr_paypal_url)
+    if previous:
+        await release(previous.logo_url, previous.qr_venmo_url, previous.qr_paypal_url)
     log_event(f"Business profile saved", user_id=uid)
     return {"status": "saved", "profile": profile.dict()}
 
 @app.get("/profile", tags=["Business Profile"])
-async def get_profile(authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
+async def get_profile(request: Request, response: Response, authorization: str = Header(...)):
+    uid = await get_uid_from_header(authorization)
+    etag = collection_etag(request, uid, "business_profiles")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers.update(etag_headers(etag))
     profile = db["business_profiles"].get(uid)
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
@@ -175,28 +301,71 @@ async def update_profile(
     logo: UploadFile = File(None),
     payment_qr: UploadFile = File(None),
 ):
-    uid = get_uid_from_header(authorization)
-
-    def save(uploaded, prefix: str):
-        if not uploaded:
-            return None
-        path = f"uploads/{prefix}_{uuid.uuid4()}.png"
-        with open(path, "wb") as f:
-            shutil.copyfileobj(uploaded.file, f)
-        return path
+    uid = await get_uid_from_header(authorization)
+    budget = UploadBudget()
+    logo_url, qr_url = await gather_stored(
+        store_upload(logo, budget),
+        store_upload(payment_qr, budget),
+    )
 
-    profile = db["business_profiles"].get(uid) or {}
+    profile = db["business_profiles"].get(uid)
     updated = {
         "business_name": business_name,
         "business_address": business_address,
         "contact_email": contact_email,
         "contact_number": contact_number,
-        "logo_url": save(logo, "logo") or profile.get("logo_url"),
-        "payment_qr_url": save(payment_qr, "qr") or profile.get("payment_qr_url"),
+        "logo_url": logo_url or (profile and profile.logo_url),
+        "qr_venmo_url": qr_url or (profile and profile.qr_venmo_url),
     }
-    profile.update(updated)
+    previous = profile
+    if profile:
+        profile = profile.copy(update=updated)
+    else:
+        profile = BusinessProfile(owner_id=uid, **updated)
     db["business_profiles"][uid] = profile
-    return {"status": "profile updated", "profile": profile}
+    brand_cache.invalidate(uid)
+    retain(logo_url, qr_url)
+    if previous:
+        await release(logo_url and previous.logo_url, qr_url and previous.qr_venmo_url)
+    return {"status": "profile updated", "profile": profile.dict()}
+
+@app.get("/rate-card", tags=["Business Profile"])
+async def get_rate_card(request: Request, response: Response, authorization: str = Header(...)):
+    uid = await get_uid_from_header(authorization)
+    etag = collection_etag(request, uid, "business_profiles")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers.update(etag_headers(etag))
+    profile = db["business_profiles"].get(uid)
+    return {
+        "custom": bool(profile and profile.rate_card),
+        "rate_card": profile.rate_card.dict(exclude_none=True) if profile and profile.rate_card else None,
+        "rates": rate_cards.evaluator(uid).rates,
+    }
+
+@app.put("/rate-card", tags=["Business Profile"])
+async def set_rate_card(card: RateCard, authorization: str = Header(...)):
+    uid = await get_uid_from_header(authorization)
+    profile = db["business_profiles"].get(uid)
+    if not profile:
+        raise HTTPException(status_code=400, detail="Business profile missing")
+    try:
+        evaluator = compile_rate_card(card)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid rate card: {e}")
+    db["business_profiles"][uid] = profile.copy(update={"rate_card": card})
+    log_event("Rate card updated", user_id=uid)
+    return {"status": "rate card saved", "rates": evaluator.rates}
+
+@app.delete("/rate-card", tags=["Business Profile"])
+async def reset_rate_card(authorization: str = Header(...)):
+    uid = await get_uid_from_header(authorization)
+    profile = db["business_profiles"].get(uid)
+    if profile and profile.rate_card:
+        db["business_profiles"][uid] = profile.copy(update={"rate_card": None})
+        log_event("Rate card reset", user_id=uid)
+    return {"status": "rate card reset"}
 
 # --- BIDS & ESTIMATES ---
 @app.post("/bid", tags=["Bids"])
@@ -214,9 +383,9 @@ async def add_bid(
     before_photos: List[UploadFile] = File([]),
     after_photos: List[UploadFile] = File([])
 ):
-    uid = get_uid_from_header(authorization)
-    quote = calculate_quote(form_data := {
-        "total_sqft": total_sqft,
+    uid = await get_uid_from_header(authorization)
+    quote = quote_for(uid, form_data := {
+        "square_footage": total_sqft,
         "num_pets": num_pets,
         "num_windows": num_windows,
         "cleanliness": cleanliness,
@@ -224,15 +393,11 @@ async def add_bid(
         "state": state
     })
     bid_id = str(uuid.uuid4())
-
-    def save_uploads(files, prefix):
-        paths = []
-        for f in files:
-            p = f"uploads/{prefix}_{uuid.uuid4()}.png"
-            with open(p, "wb") as out:
-                shutil.copyfileobj(f.file, out)
-            paths.append(p)
-        return paths
+    budget = UploadBudget()
+    before_paths, after_paths = await gather_stored(
+        store_uploads(before_photos, budget),
+        store_uploads(after_photos, budget),
+    )
 
     bid = Bid(
         bid_id=bid_id,
@@ -240,12 +405,15 @@ async def add_bid(
         client_id=client_id,
         bid_address=bid_address,
         notes=notes,
-        before_photos=save_uploads(before_photos, "before"),
-        after_photos=save_uploads(after_photos, "after"),
+        before_photos=before_paths,
+        after_photos=after_paths,
+        quote_input=normalize_quote_input(form_data),
+        created_at=datetime.datetime.utcnow().isoformat(),
     )
     bid.quote_data = quote
-    db["bids"].setdefault(uid, []).append(bid)
-    log_event(f"Bid created: {bid_id}", user_id=uid)
+    db["bids"].add(bid)
+    retain(*before_paths, *after_paths)
+    log_event(f"Bid created: {bid_id}", user_id=uid, bid_id=bid_id)
     return {
         "status": "bid saved",
         "bid": bid.dict(),
@@ -254,20 +422,56 @@ async def add_bid(
 
 @app.get("/bids", tags=["Bids"])
 async def list_bids(
+    request: Request,
+    response: Response,
     authorization: str = Header(...),
-    client: Optional[str] = None
+    client: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None,
+    stream: bool = False
 ):
-    uid = get_uid_from_header(authorization)
-    all_bids = db["bids"].get(uid, [])
+    uid = await get_uid_from_header(authorization)
+    etag = collection_etag(request, uid, "bids")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers.update(etag_headers(etag))
+    include, skip = parse_projection(Bid, fields, exclude)
+    after = decode_cursor(cursor)
+
+    def page(after, limit):
+        return db["bids"].page(uid, after=after, limit=limit, client_id=client or None)
+
+    if stream:
+        return StreamingResponse(stream_ndjson(page, after, limit, include, skip), media_type="application/x-ndjson",
+                                 headers=etag_headers(etag))
+    if limit or cursor:
+        return fetch_page(page, after, limit or PAGE_SIZE, include, skip)
     if client:
-        all_bids = [b for b in all_bids if b.client_id == client]
-    return [b.dict() for b in all_bids]
+        all_bids = db["bids"].for_client(uid, client)
+    else:
+        all_bids = db["bids"].for_owner(uid)
+    return Response(dump_records(all_bids, include, skip), media_type="application/json", headers=etag_headers(etag))
+
+@app.post("/bids/reprice", tags=["Bids"])
+async def reprice_bids(authorization: str = Header(...)):
+    uid = await get_uid_from_header(authorization)
+    bids = [b for b in db["bids"].for_owner(uid) if b.quote_input]
+    if bids:
+        columns = quote_columns([b.quote_input for b in bids])
+        quotes = quote_rows(calculate_quotes(columns, rate_cards.evaluator(uid)))
+        for bid, quote in zip(bids, quotes):
+            bid.quote_data = quote
+        db["bids"].add_many(bids)
+    log_event(f"Re-priced {len(bids)} bids", user_id=uid, count=len(bids))
+    return {"status": "bids repriced", "count": len(bids)}
 
 @app.get("/bids/{bid_id}", tags=["Bids"])
 async def get_bid(bid_id: str, authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
-    bids = db["bids"].get(uid, [])
-    bid = next((b for b in bids if b.bid_id == bid_id), None)
+    uid = await get_uid_from_header(authorization)
+    bid = db["bids"].get(uid, bid_id)
     if not bid:
         raise HTTPException(status_code=404, detail="Bid not found")
     return bid.dict()
@@ -278,37 +482,70 @@ async def calculate_quote_route(
     authorization: str = Header(...),
     form_data: dict = Body(...)
 ):
-    _ = get_uid_from_header(authorization)
-    result = calculate_quote(form_data)
-    return {"status": "ok", "quote": result}
+    uid = await get_uid_from_header(authorization)
+    return {"status": "ok", "quote": quote_for(uid, form_data)}
+
+@app.get("/calculate-quote/stats", tags=["Estimates"])
+async def calculate_quote_stats(authorization: str = Header(...)):
+    _ = await get_uid_from_header(authorization)
+    return {"status": "ok", "cache": quote_cache.stats()}
+
+@app.post("/calculate-quote/batch", tags=["Estimates"])
+async def calculate_quote_batch_route(
+    authorization: str = Header(...),
+    columns: dict = Body(...)
+):
+    uid = await get_uid_from_header(authorization)
+    lengths = {len(v) for v in columns.values() if isinstance(v, list)}
+    if len(lengths) != 1 or any(not isinstance(v, list) for v in columns.values()):
+        raise HTTPException(status_code=400, detail="Columns must be lists of equal length")
+    try:
+        quotes = calculate_quotes(columns, rate_cards.evaluator(uid))
+    except (KeyError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid quote columns: {e}")
+    return {"status": "ok", "quotes": {key: values.tolist() for key, values in quotes.items()}}
+
+@app.post("/calculate-quote/sweep", tags=["Estimates"])
+async def calculate_quote_sweep_route(
+    authorization: str = Header(...),
+    base: dict = Body(...),
+    axes: dict = Body(...)
+):
+    uid = await get_uid_from_header(authorization)
+    try:
+        values, totals = price_sweep(base, axes, rate_cards.evaluator(uid))
+    except (KeyError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid quote sweep: {e}")
+    return {
+        "status": "ok",
+        "axes": {dimension: v.tolist() for dimension, v in values.items()},
+        "totals": {key: grid.tolist() for key, grid in totals.items()},
+    }
 
 @app.post("/generate-estimate", tags=["Estimates"])
 async def generate_estimate_full(
     authorization: str = Header(...),
     form_data: dict = Body(...)
 ):
-    uid = get_uid_from_header(authorization)
+    uid = await get_uid_from_header(authorization)
     business = db["business_profiles"].get(uid)
     if not business:
         raise HTTPException(status_code=400, detail="Business profile missing")
-    quote = calculate_quote(form_data)
-    pdf_path = f"uploads/estimate_{uuid.uuid4()}.pdf"
-    generate_estimate_pdf(business, quote, pdf_path)
-    return FileResponse(pdf_path, media_type="application/pdf", filename="estimate.pdf")
+    quote = quote_for(uid, form_data)
+    pdf = await cached_estimate_pdf(business, quote)
+    return pdf_response(pdf, "estimate.pdf")
 
 @app.post("/generate-estimate/{bid_id}", tags=["Estimates"])
 async def generate_estimate_for_bid(bid_id: str, authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
+    uid = await get_uid_from_header(authorization)
     business = db["business_profiles"].get(uid)
-    bids = db["bids"].get(uid, [])
-    bid = next((b for b in bids if b.bid_id == bid_id), None)
+    bid = db["bids"].get(uid, bid_id)
     if not bid or not business:
         raise HTTPException(status_code=400, detail="Bid or business not found")
     if not getattr(bid, "quote_data", None):
         raise HTTPException(status_code=400, detail="Quote missing")
-    pdf_path = f"uploads/estimate_{uuid.uuid4()}.pdf"
-    generate_estimate_pdf(business, bid.quote_data, pdf_path)
-    return FileResponse(pdf_path, media_type="application/pdf", filename="estimate.pdf")
+    pdf = await cached_estimate_pdf(business, bid.quote_data, slot=("estimate", uid, bid_id))
+    return pdf_response(pdf, "estimate.pdf")
 
 # --- CONTRACTS & SIGNATURE ---
 @app.get("/generate-contract/{client_id}/{bid_id}", tags=["Contracts"])
@@ -317,12 +554,10 @@ async def generate_contract(
     bid_id: str,
     authorization: str = Header(...)
 ):
-    uid = get_uid_from_header(authorization)
-    clients = db["clients"].get(uid, [])
-    bids = db["bids"].get(uid, [])
+    uid = await get_uid_from_header(authorization)
     business = db["business_profiles"].get(uid)
-    client = next((c for c in clients if c.client_id == client_id), None)
-    bid = next((b for b in bids if b.bid_id == bid_id), None)
+    client = db["clients"].get(uid, client_id)
+    bid = db["bids"].get(uid, bid_id)
 
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
@@ -333,16 +568,15 @@ async def generate_contract(
     if not getattr(bid, "quote_data", None):
         raise HTTPException(status_code=400, detail="Quote missing")
 
-    pdf_path = f"uploads/contract_{bid_id}.pdf"
-    generate_contract_pdf(
+    pdf = await cached_contract_pdf(
         business=business,
         client=client,
         bid=bid,
         quote=bid.quote_data,
         cleaning_frequency=client.cleaning_frequency,
-        pdf_path=pdf_path
+        slot=("contract", uid, bid_id)
     )
-    return FileResponse(pdf_path, media_type="application/pdf", filename="contract.pdf")
+    return pdf_response(pdf, "contract.pdf")
 
 @app.post("/sign-contract/{client_id}/{bid_id}", tags=["Contracts"])
 async def sign_contract(
@@ -352,52 +586,84 @@ async def sign_contract(
     name: str = Form(...),
     signature: UploadFile = File(...)
 ):
-    uid = get_uid_from_header(authorization)
-    bids = db["bids"].get(uid, [])
-    bid = next((b for b in bids if b.bid_id == bid_id), None)
+    uid = await get_uid_from_header(authorization)
+    bid = db["bids"].get(uid, bid_id)
     if not bid:
         raise HTTPException(status_code=404, detail="Bid not found")
 
-    sig_path = f"uploads/signed_{bid_id}.png"
-    with open(sig_path, "wb") as f:
-        shutil.copyfileobj(signature.file, f)
+    sig_path = await save_upload(signature, f"signed_{bid_id}")
+    if not sig_path:
+        raise HTTPException(status_code=400, detail="Signature missing")
 
     bid.signed_contract = {
         "name": name,
         "timestamp": datetime.datetime.utcnow().isoformat(),
         "signature_path": sig_path
     }
-    log_event(f"Contract signed for bid {bid_id}", user_id=uid)
+    db["bids"].update(bid)
+    pdf_cache.invalidate(("contract", uid, bid_id))
+    log_event(f"Contract signed for bid {bid_id}", user_id=uid, bid_id=bid_id)
     return {"status": "signed"}
 
+# --- EXPORT ---
+@app.get("/export/pdfs", tags=["Export"])
+async def export_pdfs(
+    authorization: str = Header(...),
+    client: Optional[str] = None,
+    signed: Optional[bool] = None,
+    since: Optional[datetime.date] = None,
+    until: Optional[datetime.date] = None,
+    date_field: Literal["created", "signed"] = "created",
+    documents: str = ",".join(EXPORT_DOCUMENTS),
+):
+    uid = await get_uid_from_header(authorization)
+    kinds = {d.strip() for d in documents.split(",") if d.strip()}
+    if not kinds or kinds - set(EXPORT_DOCUMENTS):
+        raise HTTPException(status_code=400, detail=f"documents must be among: {', '.join(EXPORT_DOCUMENTS)}")
+    bids = select_bids(uid, client, signed, since, until, date_field)
+    jobs = export_jobs(uid, bids, kinds)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="No matching documents")
+    log_event(f"Exporting {len(jobs)} documents", user_id=uid, count=len(jobs))
+    return StreamingResponse(
+        stream_zip(jobs, uid), media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="documents.zip"'},
+    )
+
 # --- SUBSCRIPTIONS ---
 @app.post("/set-subscription", tags=["Subscriptions"])
 async def set_subscription(level: str = Form(...), authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
+    uid = await get_uid_from_header(authorization)
     if level not in ["free", "pro"]:
         raise HTTPException(status_code=400, detail="Invalid level")
     db["subscriptions"][uid] = level
     return {"status": "subscription updated", "level": level}
 
 @app.get("/subscriptions", tags=["Subscriptions"])
-async def get_subscription(authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
+async def get_subscription(request: Request, response: Response, authorization: str = Header(...)):
+    uid = await get_uid_from_header(authorization)
+    etag = collection_etag(request, uid, "subscriptions")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers.update(etag_headers(etag))
     level = db["subscriptions"].get(uid, "free")
     return {"subscription": level}
 
 # --- EMAIL ---
 @app.post("/email-estimate/{bid_id}", tags=["Email"])
 async def email_estimate(bid_id: str, authorization: str = Header(...), to: str = Form(...)):
-    uid = get_uid_from_header(authorization)
-    bid = next((b for b in db["bids"].get(uid, []) if b.bid_id == bid_id), None)
+    uid = await get_uid_from_header(authorization)
+    bid = db["bids"].get(uid, bid_id)
     if not bid:
         raise HTTPException(status_code=404, detail="Bid not found")
 
     business = db["business_profiles"].get(uid)
-    pdf_path = f"uploads/estimate_{bid_id}.pdf"
-    generate_estimate_pdf(business, bid.quote_data, pdf_path)
-    send_email_with_attachment(to, "Your Estimate", "Here is your cleaning estimate.", pdf_path)
-    db["email_log"].setdefault((uid, bid_id), []).append({
+    if not business or not bid.quote_data:
+        raise HTTPException(status_code=400, detail="Quote or business profile missing")
+    pdf = await cached_estimate_pdf(business, bid.quote_data, slot=("estimate", uid, bid_id))
+    await send_email_async(to, "Your Estimate", "Here is your cleaning estimate.", pdf, filename="estimate.pdf")
+    db["email_log"].append(uid, bid_id, {
         "timestamp": datetime.datetime.utcnow().isoformat(),
         "to": to,
         "attachment": "estimate"
@@ -406,17 +672,20 @@ async def email_estimate(bid_id: str, authorization: str = Header(...), to: str
 
 @app.post("/email-contract/{client_id}/{bid_id}", tags=["Email"])
 async def email_contract(client_id: str, bid_id: str, authorization: str = Header(...), to: str = Form(...)):
-    uid = get_uid_from_header(authorization)
-    bid = next((b for b in db["bids"].get(uid, []) if b.bid_id == bid_id), None)
-    client = next((c for c in db["clients"].get(uid, []) if c.client_id == client_id), None)
+    uid = await get_uid_from_header(authorization)
+    bid = db["bids"].get(uid, bid_id)
+    client = db["clients"].get(uid, client_id)
     business = db["business_profiles"].get(uid)
     if not bid or not client:
         raise HTTPException(status_code=404, detail="Bid or client not found")
 
-    pdf_path = f"uploads/contract_{bid_id}.pdf"
-    generate_contract_pdf(business, client, bid, bid.quote_data, client.cleaning_frequency, pdf_path)
-    send_email_with_attachment(to, "Your Contract", "Please review and sign.", pdf_path)
-    db["email_log"].setdefault((uid, bid_id), []).append({
+    if not business or not bid.quote_data:
+        raise HTTPException(status_code=400, detail="Quote or business profile missing")
+    pdf = await cached_contract_pdf(
+        business, client, bid, bid.quote_data, client.cleaning_frequency, slot=("contract", uid, bid_id)
+    )
+    await send_email_async(to, "Your Contract", "Please review and sign.", pdf, filename="contract.pdf")
+    db["email_log"].append(uid, bid_id, {
         "timestamp": datetime.datetime.utcnow().isoformat(),
         "to": to,
         "attachment": "contract"
@@ -425,48 +694,112 @@ async def email_contract(client_id: str, bid_id: str, authorization: str = Heade
 
 @app.get("/bids/{bid_id}/messages", tags=["Email"])
 async def get_bid_messages(bid_id: str, authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
-    return {"messages": db["email_log"].get((uid, bid_id), [])}
+    uid = await get_uid_from_header(authorization)
+    return {"messages": db["email_log"].for_bid(uid, bid_id)}
 
 # --- CALENDAR ---
 @app.get("/calendar/contract/{client_id}/{bid_id}", tags=["Calendar"])
 async def export_contract_ics(client_id: str, bid_id: str, authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
-    bid = next((b for b in db["bids"].get(uid, []) if b.bid_id == bid_id), None)
-    client = next((c for c in db["clients"].get(uid, []) if c.client_id == client_id), None)
+    uid = await get_uid_from_header(authorization)
+    bid = db["bids"].get(uid, bid_id)
+    client = db["clients"].get(uid, client_id)
     business = db["business_profiles"].get(uid)
     if not bid or not client or not business:
         raise HTTPException(status_code=404, detail="Missing data")
+    if not (bid.signed_contract or {}).get("timestamp"):
+        raise HTTPException(status_code=400, detail="Contract not signed")
 
-    ics_content = generate_ics(
-        business, client, bid,  bid.quote_data, email=client.contact_email, pdf_path=f"uploads/contract/{bid_id}.pdf"
+    return Response(
+        generate_ics(business, client, bid), media_type="text/calendar",
+        headers={"Content-Disposition": 'attachment; filename="contract_event.ics"'},
     )
-    return FileResponse(ics_content, media_type="text/calendar", filename="contract_event.ics")
+
+@app.get("/calendar/feed-token", tags=["Calendar"])
+async def get_calendar_feed_token(authorization: str = Header(...)):
+    uid = await get_uid_from_header(authorization)
+    token = feed_token(uid)
+    return {"token": token, "url": f"/calendar/feed.ics?token={token}"}
+
+@app.post("/calendar/feed-token", tags=["Calendar"])
+async def rotate_calendar_feed_token(authorization: str = Header(...)):
+    uid = await get_uid_from_header(authorization)
+    token = feed_token(uid, rotate=True)
+    return {"token": token, "url": f"/calendar/feed.ics?token={token}"}
+
+@app.get("/calendar/feed.ics", tags=["Calendar"])
+async def calendar_feed(request: Request, token: str):
+    uid = owner_for_token(token)
+    if not uid:
+        raise HTTPException(status_code=404, detail="Unknown calendar feed")
+    etag, body = calendar_feeds.cached(uid) or await executors.run_io(calendar_feeds.build, uid)
+    return not_modified(request, etag) or Response(body, media_type="text/calendar", headers=etag_headers(etag))
 
 # --- AREA ESTIMATOR ---
 @app.post("/estimate-area", tags=["Estimates"])
 @require_subscription("pro")
-async def estimate_area(request: Request, photo: UploadFile = File(...)):
-    uid = request.state.uid
-    filepath = f"uploads/area_{uuid.uuid4()}.jpg"
-    with open(filepath, "wb") as f:
-        shutil.copyfileobj(photo.file, f)
-    area = estimate_area_from_image(filepath)
-    return {"estimated_area_sqft": area, "plan": request.state.subscription_level}
+async def estimate_area(request: Request, photo: UploadFile = File(...), known_width_inches: float = Form(120)):
+    if known_width_inches <= 0:
+        raise HTTPException(status_code=400, detail="known_width_inches must be positive")
+    image = await read_upload(photo)
+    result = await cached_area_estimate(image, known_width_inches)
+    return {**result, "plan": request.state.subscription_level}
+
+@app.get("/estimate-area/stats", tags=["Estimates"])
+async def estimate_area_stats(authorization: str = Header(...)):
+    _ = await get_uid_from_header(authorization)
+    return {"status": "ok", "cache": area_cache.stats()}
+
+# --- PHOTOS ---
+@app.get("/photos/{digest}/url", tags=["Bids"])
+async def get_photo_url(digest: str, size: Optional[int] = None, authorization: str = Header(...)):
+    uid = await get_uid_from_header(authorization)
+    if not find_blob(digest) or not await executors.run_io(owner_references, uid, digest):
+        raise HTTPException(status_code=404, detail="Photo not found")
+    url, expires = signed_photo_url(digest, size)
+    return {"url": url, "expires": expires}
+
+@app.get("/photos/{digest}", tags=["Bids"])
+async def get_photo(
+    digest: str,
+    size: Optional[int] = None,
+    expires: Optional[int] = None,
+    signature: Optional[str] = None,
+    authorization: Optional[str] = Header(None),
+):
+    # <img> tags cannot send an Authorization header, so galleries load
+    # short-lived signed URLs from /photos/{digest}/url instead
+    if not valid_signature(digest, expires, signature):
+        if not authorization:
+            raise HTTPException(status_code=401, detail="Photo link expired or missing")
+        uid = await get_uid_from_header(authorization)
+        if not await executors.run_io(owner_references, uid, digest):
+            raise HTTPException(status_code=404, detail="Photo not found")
+    path = find_blob(digest)
+    if not path:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    if size in THUMBNAIL_SIZES and os.path.exists(thumbnail_path(digest, size)):
+        return FileResponse(thumbnail_path(digest, size), media_type="image/webp")
+    return FileResponse(path)
 
 # --- DELETE ROUTES ---
 @app.delete("/bid/{bid_id}", tags=["Bids"])
 async def delete_bid(bid_id: str, authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
-    db["bids"][uid] = [b for b in db["bids"].get(uid, []) if b.bid_id != bid_id]
+    uid = await get_uid_from_header(authorization)
+    bid = db["bids"].remove(uid, bid_id)
+    if bid:
+        await release(*bid.before_photos, *bid.after_photos)
+    pdf_cache.invalidate(("estimate", uid, bid_id))
+    pdf_cache.invalidate(("contract", uid, bid_id))
     return {"status": "bid deleted"}
 
 @app.delete("/estimate/{bid_id}", tags=["Estimates"])
 async def delete_estimate(bid_id: str, authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
+    uid = await get_uid_from_header(authorization)
+    pdf_cache.invalidate(("estimate", uid, bid_id))
     return {"status": "estimate deleted"}
 
 @app.delete("/contract/{bid_id}", tags=["Contracts"])
 async def delete_contract(bid_id: str, authorization: str = Header(...)):
-    uid = get_uid_from_header(authorization)
+    uid = await get_uid_from_header(authorization)
+    pdf_cache.invalidate(("contract", uid, bid_id))
     return {"status": "contract deleted"}
\ No newline at end of file
@@ -0,0 +1,133 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from utils.logger import log_event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", "1.0"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # when set, /metrics requires "Bearer <token>"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labels, values)} {count}" for values, count in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *values):
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for values, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), values + (bound,))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), values + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+
+request_latency = Histogram(
+    "hca_http_request_duration_seconds", "Request latency by route template.", ("method", "route")
+)
+request_count = Counter(
+    "hca_http_requests_total", "Requests by route template and status code.", ("method", "route", "status")
+)
+span_latency = Histogram(
+    "hca_span_duration_seconds", "Time spent in instrumented subsystems.", ("span",)
+)
+span_errors = Counter("hca_span_errors_total", "Instrumented calls that raised.", ("span",))
+slow_requests = Counter("hca_slow_requests_total", "Requests slower than SLOW_REQUEST_SECONDS.", ("route",))
+
+REGISTRY = [request_latency, request_count, span_latency, span_errors, slow_requests]
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block into hca_span_duration_seconds{span=name}."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        span_errors.inc(name)
+        raise
+    finally:
+        span_latency.observe(time.perf_counter() - start, name)
+
+
+def timed(name):
+    """Decorator form of ``span`` for plain functions."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_request(method, route, status, duration, uid=None):
+    request_latency.observe(duration, method, route)
+    request_count.inc(method, route, str(status))
+    if duration >= SLOW_REQUEST_SECONDS:
+        slow_requests.inc(route)
+        if random.random() < SLOW_REQUEST_SAMPLE_RATE:
+            log_event("Slow request", level="warning", user_id=uid, method=method, route=route,
+                      status=status, duration_ms=round(duration * 1000, 1))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
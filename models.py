@@ -24,12 +24,32 @@ class Bid(BaseModel):
     notes: str
     before_photos: List[str] = []
     after_photos: List[str] = []
+    quote_input: Optional[Dict[str, Any]] = None  # calculate_quote inputs, kept for re-pricing
     quote_data: Optional[Dict[str, Any]] = None
+    signed_contract: Optional[Dict[str, Any]] = None
+    created_at: Optional[str] = None  # UTC ISO timestamp
 
     @property
     def maps_link(self):
         return f"https://www.google.com/maps/search/?api=1&query={self.bid_address.replace(' ', '+')}"
 
+class RateCard(BaseModel):
+    """A business's own pricing; unset fields fall back to quote_engine.DEFAULT_RATES."""
+    sqft_rate: Optional[float] = None
+    pet_fee: Optional[float] = None
+    window_fee: Optional[float] = None
+    outside_window_fee: Optional[float] = None
+    travel_rate: Optional[float] = None  # per mile, charged both ways
+    floor_fees: Optional[Dict[str, float]] = None  # carpet, hardwood, tile, laminate
+    knickknack_fees: Optional[List[float]] = None  # one per level, 0-3
+    cleanliness_multipliers: Optional[List[float]] = None  # one per level, 0-5
+    tax_rates: Optional[Dict[str, float]] = None  # state code -> rate, merged over the defaults
+    biweekly_factor: Optional[float] = None
+    weekly_factor: Optional[float] = None
+
+    class Config:
+        extra = "forbid"
+
 class BusinessProfile(BaseModel):
     owner_id: str  # Firebase UID
     owner_name: Optional[str] = None
@@ -39,4 +59,5 @@ class BusinessProfile(BaseModel):
     contact_number: str
     logo_url: Optional[str] = None
     qr_venmo_url: Optional[str] = None
-    qr_paypal_url: Optional[str] = None
\ No newline at end of file
+    qr_paypal_url: Optional[str] = None
+    rate_card: Optional[RateCard] = None
\ No newline at end of file
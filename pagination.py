@@ -0,0 +1,65 @@
+import base64
+
+from fastapi import HTTPException
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH = 200
+
+
+def encode_cursor(seq):
+    return base64.urlsafe_b64encode(f"v1:{seq}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        version, seq = raw.split(":", 1)
+        if version != "v1":
+            raise ValueError(version)
+        return int(seq)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_projection(model, fields=None, exclude=None):
+    """Turn the ``fields``/``exclude`` query strings into include/exclude sets for ``model``."""
+    def names(value):
+        if not value:
+            return None
+        requested = {name.strip() for name in value.split(",") if name.strip()}
+        unknown = requested - set(model.__fields__)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        return requested
+    return names(fields), names(exclude)
+
+
+def fetch_page(page, after, limit, include=None, exclude=None):
+    """One page of records from a store's ``page`` callable, plus the cursor for the next one."""
+    rows = page(after=after, limit=limit + 1)
+    items = [record.dict(include=include, exclude=exclude) for _, record in rows[:limit]]
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def dump_records(records, include=None, exclude=None):
+    """A JSON array of records, serialized directly rather than through jsonable_encoder."""
+    return "[" + ",".join(record.json(include=include, exclude=exclude) for record in records) + "]"
+
+
+def stream_ndjson(page, after=0, limit=None, include=None, exclude=None):
+    """Yield records as NDJSON lines, fetching and serializing one batch at a time."""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        batch = STREAM_BATCH if remaining is None else min(STREAM_BATCH, remaining)
+        rows = page(after=after, limit=batch)
+        for _, record in rows:
+            yield record.json(include=include, exclude=exclude) + "\n"
+        if len(rows) < batch:
+            return
+        after = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from branding import brand_cache
+from executors import executors
+from metrics import span
+from pdf_generator import generate_contract_pdf, generate_estimate_pdf
+
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Bump whenever pdf_generator's layout changes so old renders stop matching
+RENDER_VERSION = 2
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _dump(value):
+    return value.dict() if hasattr(value, "dict") else value
+
+
+def estimate_key(business, quote):
+    return fingerprint("estimate", business=_dump(business), quote=quote)
+
+
+def contract_key(business, client, bid, quote, cleaning_frequency):
+    signed = bid.signed_contract or {}
+    return fingerprint(
+        "contract",
+        business=_dump(business),
+        client=_dump(client),
+        bid=_dump(bid),
+        quote=quote,
+        cleaning_frequency=cleaning_frequency,
+        signature=_file_stamp(signed.get("signature_path")),
+    )
+
+
+def fingerprint(kind, **inputs):
+    """sha256 over every input that can change the rendered document."""
+    payload = json.dumps({"kind": kind, "version": RENDER_VERSION, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PDFCache:
+    """Size-bounded, content-addressed LRU of rendered PDFs held in memory.
+
+    Entries are keyed by the digest of their inputs, so any change to the
+    business, client, bid, quote or signature produces a new key. Each
+    document slot (e.g. the contract for one bid) remembers its latest
+    digest, and the superseded render is dropped as soon as it is replaced.
+    """
+
+    def __init__(self, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # digest -> PDF bytes
+        self._slots = {}               # slot -> digest
+        self._slot_refs = {}           # digest -> set of slots pointing at it
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            data = self._entries.get(digest)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return data
+
+    def put(self, digest, data, slot=None):
+        with self._lock:
+            self._bytes += len(data) - len(self._entries.get(digest, b""))
+            self._entries[digest] = data
+            self._entries.move_to_end(digest)
+            if slot is not None:
+                previous = self._slots.get(slot)
+                if previous != digest:
+                    self._unlink_slot(slot, discard=True)
+                    self._slots[slot] = digest
+                    self._slot_refs.setdefault(digest, set()).add(slot)
+            self._evict()
+        return data
+
+    def invalidate(self, slot):
+        with self._lock:
+            self._unlink_slot(slot, discard=True)
+
+    def stats(self):
+        return {
+            "documents": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _unlink_slot(self, slot, discard=False):
+        digest = self._slots.pop(slot, None)
+        if digest is None:
+            return
+        slots = self._slot_refs.get(digest, set())
+        slots.discard(slot)
+        if not slots:
+            self._slot_refs.pop(digest, None)
+            if discard:
+                self._discard(digest)
+
+    def _discard(self, digest):
+        self._bytes -= len(self._entries.pop(digest, b""))
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            digest = next(iter(self._entries))
+            self._discard(digest)
+            for slot in self._slot_refs.pop(digest, ()):
+                del self._slots[slot]
+
+
+pdf_cache = PDFCache()
+
+
+async def _render(digest, render, business, *args, slot=None):
+    data = pdf_cache.get(digest)
+    if data is None:
+        brand = await brand_cache.layout(business)
+        with span(render.__name__):
+            data = await executors.run_cpu(render, business, *args, brand=brand)
+        pdf_cache.put(digest, data, slot)
+    return data
+
+
+async def cached_estimate_pdf(business, quote, slot=None):
+    """Bytes of the estimate PDF, rendered on the process pool on a cache miss."""
+    return await _render(estimate_key(business, quote), generate_estimate_pdf, business, quote, slot=slot)
+
+
+async def cached_contract_pdf(business, client, bid, quote, cleaning_frequency, slot=None):
+    """Bytes of the contract PDF, rendered on the process pool on a cache miss."""
+    return await _render(
+        contract_key(business, client, bid, quote, cleaning_frequency),
+        generate_contract_pdf, business, client, bid, quote, cleaning_frequency,
+        slot=slot,
+    )
@@ -1,15 +1,55 @@
 from fpdf import FPDF
 import os
 
-def generate_contract_pdf(business, client, bid, quote, cleaning_frequency, pdf_path):
+def output(pdf, pdf_path=None):
+    """Write the PDF to ``pdf_path``, or return its bytes when no path is given."""
+    if pdf_path:
+        pdf.output(pdf_path)
+        return pdf_path
+    data = pdf.output(dest="S")
+    # fpdf 1.x returns a latin-1 str, fpdf2 a bytearray
+    return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+def brand_header(pdf, brand):
+    """Draw the prepared logo top-left; returns the y the body has to start below."""
+    logo = brand and brand.get("logo")
+    if not logo:
+        return 0
+    pdf.image(logo["path"], x=10, y=8, w=logo["w"], h=logo["h"])
+    return 8 + logo["h"] + 4
+
+def payment_footer(pdf, brand):
+    """Prepared payment QR codes side by side, each labelled underneath."""
+    qrs = brand and brand.get("qrs")
+    if not qrs:
+        return
+    height = max(qr["h"] for qr in qrs) + 20
+    if pdf.get_y() + height > pdf.h - pdf.b_margin:
+        pdf.add_page()
+    pdf.ln(5)
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(200, 10, txt="Payment Options", ln=True)
+    top = pdf.get_y()
+    x = 10
+    pdf.set_font("Arial", "", 10)
+    for qr in qrs:
+        pdf.image(qr["path"], x=x, y=top, w=qr["w"], h=qr["h"])
+        pdf.set_xy(x, top + qr["h"] + 1)
+        pdf.cell(qr["w"], 6, txt=qr["label"], align="C")
+        x += qr["w"] + 15
+    pdf.set_y(top + height - 10)
+
+def generate_contract_pdf(business, client, bid, quote, cleaning_frequency, pdf_path=None, brand=None):
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
 
     # Header
+    body_top = brand_header(pdf, brand)
     pdf.cell(200, 10, txt=f"{business.business_name}", ln=True, align="C")
     pdf.cell(200, 10, txt="Service Agreement", ln=True, align="C")
     pdf.ln(10)
+    pdf.set_y(max(pdf.get_y(), body_top))
 
     # Client Info
     pdf.cell(200, 10, txt=f"Client: {client.name}", ln=True)
@@ -25,8 +65,8 @@ def generate_contract_pdf(business, client, bid, quote, cleaning_frequency, pdf_
     # Quote Summary
     pdf.cell(200, 10, txt="Pricing Summary", ln=True)
     pdf.cell(200, 10, txt=f"One-Time / Deep Clean: ${quote['total']:.2f}", ln=True)
-    pdf.cell(200, 10, txt=f"Bi-Weekly: ${quote['bi_week']:.2f}", ln=True)
-    pdf.cell(200, 10, txt=f"Weekly: ${quote['week']:.2f}", ln=True)
+    pdf.cell(200, 10, txt=f"Bi-Weekly: ${quote['biweekly']:.2f}", ln=True)
+    pdf.cell(200, 10, txt=f"Weekly: ${quote['weekly']:.2f}", ln=True)
     pdf.ln(10)
 
     # Terms
@@ -62,17 +102,21 @@ def generate_contract_pdf(business, client, bid, quote, cleaning_frequency, pdf_
         pdf.cell(90, 10, txt="Date: ____________________", ln=False)
         pdf.cell(90, 10, txt="Date: ____________________", ln=True)
 
+    payment_footer(pdf, brand)
+
     # Output
-    pdf.output(pdf_path)
+    return output(pdf, pdf_path)
 
-def generate_estimate_pdf(business, quote, pdf_path):
+def generate_estimate_pdf(business, quote, pdf_path=None, brand=None):
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
 
+    body_top = brand_header(pdf, brand)
     pdf.cell(200, 10, txt=f"{business.business_name}", ln=True, align="C")
     pdf.cell(200, 10, txt="Estimate Summary", ln=True, align="C")
     pdf.ln(10)
+    pdf.set_y(max(pdf.get_y(), body_top))
 
     pdf.cell(200, 10, txt=f"Contact: {business.contact_email} | {business.contact_number}", ln=True)
     pdf.cell(200, 10, txt=f"Address: {business.business_address}", ln=True)
@@ -91,7 +135,9 @@ def generate_estimate_pdf(business, quote, pdf_path):
     pdf.set_font("Arial", "B", 12)
     pdf.cell(200, 10, txt=f"TOTAL: ${quote['total']:.2f}", ln=True)
     pdf.set_font("Arial", "", 12)
-    pdf.cell(200, 10, txt=f"Bi-Weekly: ${quote['bi_week']:.2f}", ln=True)
-    pdf.cell(200, 10, txt=f"Weekly: ${quote['week']:.2f}", ln=True)
+    pdf.cell(200, 10, txt=f"Bi-Weekly: ${quote['biweekly']:.2f}", ln=True)
+    pdf.cell(200, 10, txt=f"Weekly: ${quote['weekly']:.2f}", ln=True)
+
+    payment_footer(pdf, brand)
 
-    pdf.output(pdf_path)
\ No newline at end of file
+    return output(pdf, pdf_path)
@@ -0,0 +1,54 @@
+import hashlib
+import hmac
+import os
+import secrets
+import time
+
+from database import db
+from thumbnails import digest_of
+
+PHOTO_URL_TTL_SECONDS = int(os.getenv("PHOTO_URL_TTL_SECONDS", "3600"))
+
+_secret = None
+
+
+def _key():
+    """PHOTO_URL_SECRET, or a random key generated once and shared through the database."""
+    global _secret
+    if _secret is None:
+        secret = os.getenv("PHOTO_URL_SECRET") or db["settings"].setdefault("photo_url_secret", secrets.token_hex(32))
+        _secret = secret.encode()
+    return _secret
+
+
+def _signature(digest, expires):
+    return hmac.new(_key(), f"{digest}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def signed_photo_url(digest, size=None, ttl=PHOTO_URL_TTL_SECONDS):
+    """(url, expiry) that loads a photo without an Authorization header, e.g. from an <img> tag."""
+    expires = int(time.time()) + ttl
+    url = f"/photos/{digest}?expires={expires}&signature={_signature(digest, expires)}"
+    if size:
+        url += f"&size={size}"
+    return url, expires
+
+
+def valid_signature(digest, expires, signature):
+    if not expires or not signature or expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(digest, expires), signature)
+
+
+def owner_references(uid, digest):
+    """Whether any of the owner's bids or their business profile uses the blob with ``digest``."""
+    profile = db["business_profiles"].get(uid)
+    if profile and any(
+        url and digest_of(url) == digest for url in (profile.logo_url, profile.qr_venmo_url, profile.qr_paypal_url)
+    ):
+        return True
+    return any(
+        digest_of(path) == digest
+        for bid in db["bids"].for_owner(uid)
+        for path in (*bid.before_photos, *bid.after_photos)
+    )
@@ -1,66 +1,297 @@
-def get_state_tax(state):
-    rates = {
-        "AL": 0.04,    "AK": 0.00,  "AZ": 0.056, "AR": 0.065, "CA": 0.0625, "CO": 0.029,
-        "CT": 0.0635,  "DE": 0.00,  "DC": 0.06,   "FL": 0.06,   "GA": 0.04,   "HI": 0.04,
-        "ID": 0.06,    "IL": 0.0625,"IN": 0.07,   "IA": 0.06,   "KS": 0.065,  "KY": 0.06,
-        "LA": 0.05,    "ME": 0.055, "MD": 0.06,   "MA": 0.0625,"MI": 0.06,   "MN": 0.06875,
-        "MS": 0.07,    "MO": 0.04225,"MT": 0.00,  "NE": 0.055,  "NV": 0.0685, "NH": 0.00,
-        "NJ": 0.06625, "NM": 0.04875,"NY": 0.04,  "NC": 0.0475, "ND": 0.05,   "OH": 0.0575,
-        "OK": 0.045,   "OR": 0.00,   "PA": 0.06,   "RI": 0.07,   "SC": 0.06,   "SD": 0.045,
-        "TN": 0.07,    "TX": 0.0625, "UT": 0.0485, "VT": 0.06,   "VA": 0.043,  "WA": 0.065,
-        "WV": 0.06,    "WI": 0.05,   "WY": 0.04
-    }
-    return rates.get(state.upper(), 0.0)
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+from cache import LRUCache
+from metrics import timed
+
+STATE_TAX_RATES = {
+    "AL": 0.04,    "AK": 0.00,  "AZ": 0.056, "AR": 0.065, "CA": 0.0625, "CO": 0.029,
+    "CT": 0.0635,  "DE": 0.00,  "DC": 0.06,   "FL": 0.06,   "GA": 0.04,   "HI": 0.04,
+    "ID": 0.06,    "IL": 0.0625,"IN": 0.07,   "IA": 0.06,   "KS": 0.065,  "KY": 0.06,
+    "LA": 0.05,    "ME": 0.055, "MD": 0.06,   "MA": 0.0625,"MI": 0.06,   "MN": 0.06875,
+    "MS": 0.07,    "MO": 0.04225,"MT": 0.00,  "NE": 0.055,  "NV": 0.0685, "NH": 0.00,
+    "NJ": 0.06625, "NM": 0.04875,"NY": 0.04,  "NC": 0.0475, "ND": 0.05,   "OH": 0.0575,
+    "OK": 0.045,   "OR": 0.00,   "PA": 0.06,   "RI": 0.07,   "SC": 0.06,   "SD": 0.045,
+    "TN": 0.07,    "TX": 0.0625, "UT": 0.0485, "VT": 0.06,   "VA": 0.043,  "WA": 0.065,
+    "WV": 0.06,    "WI": 0.05,   "WY": 0.04
+}
+
+CLEANLINESS_MULTIPLIERS = {
+    0: 1.00,
+    1: 1.05,
+    2: 1.10,
+    3: 1.20,
+    4: 1.30,
+    5: 1.50
+}
+
+KNICKKNACK_FEES = [0, 10, 15, 20]
+
+FLOOR_TYPES = ("carpet", "hardwood", "tile", "laminate")
+
+# Platform pricing; a business's rate card overrides any of these
+DEFAULT_RATES = {
+    "sqft_rate": 0.12,
+    "pet_fee": 15,
+    "window_fee": 4,
+    "outside_window_fee": 7,
+    "travel_rate": 0.5,  # per mile, charged both ways
+    "floor_fees": {"carpet": 10, "hardwood": 15, "tile": 15, "laminate": 10},
+    "knickknack_fees": KNICKKNACK_FEES,
+    "cleanliness_multipliers": [CLEANLINESS_MULTIPLIERS[level] for level in range(6)],
+    "tax_rates": STATE_TAX_RATES,
+    "biweekly_factor": 0.5,
+    "weekly_factor": 0.333,
+}
+
+
+QUOTE_COLUMNS = ("square_footage", "num_pets", "num_windows", "cleanliness", "travel_miles", "state")
+OPTIONAL_QUOTE_COLUMNS = {
+    "windows_outside": False,
+    "knickknack": 0,
+    "floor_carpet": False,
+    "floor_hardwood": False,
+    "floor_tile": False,
+    "floor_laminate": False,
+}
+
+# Inputs /calculate-quote/sweep can vary, and the most prices one sweep may return
+SWEEP_DIMENSIONS = ("square_footage", "cleanliness", "num_pets", "travel_miles")
+MAX_SWEEP_CELLS = int(os.getenv("MAX_SWEEP_CELLS", "10000"))
+
+quote_cache = LRUCache(
+    maxsize=int(os.getenv("QUOTE_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("QUOTE_CACHE_TTL", "3600")),
+)
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _level(value):
+    level = float(value)
+    return int(level) if level.is_integer() else level
 
-def get_cleanliness_multiplier(level):
+
+def normalize_quote_input(data: dict):
+    """Canonical calculate_quote inputs: numbers parsed, state upper-cased, optional flags filled in."""
+    if 'square_footage' not in data and 'total_sqft' in data:
+        data = {**data, 'square_footage': data['total_sqft']}
     return {
-        0: 1.00,
-        1: 1.05,
-        2: 1.10,
-        3: 1.20,
-        4: 1.30,
-        5: 1.50
-    }.get(level, 1.00)
-
-
-def get_knickknack_fee(level):
-    return [0, 10, 15, 20][level] if level in [0, 1, 2, 3] else 0
-
-
-def get_floor_type_cost(carpet=False, hardwood=False, tile=False, laminate=False):
-    cost = 0
-    if carpet: cost += 10
-    if hardwood: cost += 15
-    if tile: cost += 15
-    if laminate: cost += 10
-    return cost
-
-
-def calculate_quote(data: dict):
-    sqft = data['square_footage']
-    pets = data['num_pets']
-    num_windows = data['num_windows']
-    outside_windows = data['windows_outside']
-    cleanliness = data['cleanliness']
-    travel_miles = data['travel_miles']
-    state = data['state']
-
-    floor_fee = get_floor_type_cost(
-        carpet=data.get("floor_carpet", False),
-        hardwood=data.get("floor_hardwood", False),
-        tile=data.get("floor_tile", False),
-        laminate=data.get("floor_laminate", False),
-    )
-    knick_fee = get_knickknack_fee(data['knickknack'])
-
-    base = sqft * 0.12
-    pet_fee = pets * 15
-    window_fee = num_windows * (7 if outside_windows else 4)
-    travel_fee = travel_miles * 2 * 0.5
-    multiplier = get_cleanliness_multiplier(cleanliness)
+        "square_footage": float(data['square_footage']),
+        "num_pets": float(data['num_pets']),
+        "num_windows": float(data['num_windows']),
+        "cleanliness": _level(data['cleanliness']),
+        "travel_miles": float(data['travel_miles']),
+        "state": str(data['state']).strip().upper(),
+        "windows_outside": _flag(data.get('windows_outside', False)),
+        "knickknack": _level(data.get('knickknack', 0)),
+        "floor_carpet": _flag(data.get('floor_carpet', False)),
+        "floor_hardwood": _flag(data.get('floor_hardwood', False)),
+        "floor_tile": _flag(data.get('floor_tile', False)),
+        "floor_laminate": _flag(data.get('floor_laminate', False)),
+    }
+
+
+def effective_rates(card=None):
+    """DEFAULT_RATES with a rate card's set fields applied; floor fees and tax rates merge per key.
+
+    Raises ValueError for a card that cannot be priced with.
+    """
+    if hasattr(card, "dict"):
+        card = card.dict()
+    overrides = {key: value for key, value in (card or {}).items() if value is not None}
+    unknown = set(overrides) - set(DEFAULT_RATES)
+    if unknown:
+        raise ValueError(f"unknown rate card fields: {', '.join(sorted(unknown))}")
+    rates = {**DEFAULT_RATES, **overrides}
+    rates["floor_fees"] = {**DEFAULT_RATES["floor_fees"], **overrides.get("floor_fees", {})}
+    taxes = {str(code).strip().upper(): rate for code, rate in overrides.get("tax_rates", {}).items()}
+    rates["tax_rates"] = {**STATE_TAX_RATES, **taxes}
+
+    if set(rates["floor_fees"]) - set(FLOOR_TYPES):
+        raise ValueError(f"floor_fees keys must be among: {', '.join(FLOOR_TYPES)}")
+    if len(rates["knickknack_fees"]) != len(KNICKKNACK_FEES):
+        raise ValueError(f"knickknack_fees needs {len(KNICKKNACK_FEES)} levels")
+    if len(rates["cleanliness_multipliers"]) != len(CLEANLINESS_MULTIPLIERS):
+        raise ValueError(f"cleanliness_multipliers needs {len(CLEANLINESS_MULTIPLIERS)} levels")
+    numbers = [value for key, value in rates.items() if not isinstance(value, (dict, list, tuple))]
+    numbers += list(rates["floor_fees"].values()) + list(rates["knickknack_fees"])
+    numbers += list(rates["cleanliness_multipliers"]) + list(rates["tax_rates"].values())
+    if any(isinstance(value, bool) or not isinstance(value, (int, float)) for value in numbers):
+        raise ValueError("rates must be numbers")
+    # NaN and infinity would be saved, then fail every quote as unencodable JSON
+    if any(not math.isfinite(value) for value in numbers):
+        raise ValueError("rates must be finite")
+    if any(value < 0 for value in numbers):
+        raise ValueError("rates must not be negative")
+    if any(not 0 <= rate < 1 for rate in rates["tax_rates"].values()):
+        raise ValueError("tax_rates must be fractions between 0 and 1")
+    return rates
+
+
+def rate_card_key(rates):
+    return hashlib.sha256(json.dumps(rates, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _compile_price(rates):
+    sqft_rate = rates["sqft_rate"]
+    pet_rate = rates["pet_fee"]
+    window_rate = rates["window_fee"]
+    outside_window_rate = rates["outside_window_fee"]
+    travel_rate = rates["travel_rate"]
+    carpet, hardwood, tile, laminate = (rates["floor_fees"][floor] for floor in FLOOR_TYPES)
+    knickknack_fees = dict(enumerate(rates["knickknack_fees"]))
+    multipliers = dict(enumerate(rates["cleanliness_multipliers"]))
+    tax_rates = rates["tax_rates"]
+    biweekly_factor = rates["biweekly_factor"]
+    weekly_factor = rates["weekly_factor"]
+
+    def price(data):
+        floor_fee = (
+            (carpet if data.get("floor_carpet", False) else 0)
+            + (hardwood if data.get("floor_hardwood", False) else 0)
+            + (tile if data.get("floor_tile", False) else 0)
+            + (laminate if data.get("floor_laminate", False) else 0)
+        )
+        knick_fee = knickknack_fees.get(data.get('knickknack', 0), 0)
+
+        base = data['square_footage'] * sqft_rate
+        pet_fee = data['num_pets'] * pet_rate
+        window_fee = data['num_windows'] * (outside_window_rate if data.get('windows_outside', False) else window_rate)
+        travel_fee = data['travel_miles'] * 2 * travel_rate
+        multiplier = multipliers.get(data['cleanliness'], 1.00)
+
+        subtotal = (base + pet_fee + floor_fee + window_fee + knick_fee + travel_fee) * multiplier
+        tax = subtotal * tax_rates.get(data['state'].upper(), 0.0)
+        total = subtotal + tax
+
+        return {
+            "base_rate": base,
+            "pet_fee": pet_fee,
+            "floor_fee": floor_fee,
+            "window_fee": window_fee,
+            "knickknack_fee": knick_fee,
+            "travel_fee": travel_fee,
+            "cleanliness_multiplier": multiplier,
+            "subtotal": subtotal,
+            "tax": tax,
+            "total": total,
+            "biweekly": total * biweekly_factor,
+            "weekly": total * weekly_factor
+        }
+
+    return price
+
+
+class QuoteEvaluator:
+    """A rate card compiled once into a pricing closure and the batch path's lookup arrays.
+
+    The extra trailing slot of each lookup array holds the fallback used
+    for unknown states and out-of-range levels.
+    """
+
+    def __init__(self, rates):
+        self.rates = rates
+        self.key = rate_card_key(rates)
+        self.price = _compile_price(rates)
+        codes = sorted(rates["tax_rates"])
+        self.state_index = {code: i for i, code in enumerate(codes)}
+        self.tax_lookup = np.array([rates["tax_rates"][code] for code in codes] + [0.0])
+        self.cleanliness_lookup = np.array(list(rates["cleanliness_multipliers"]) + [1.00])
+        self.knickknack_lookup = np.array(list(rates["knickknack_fees"]) + [0], dtype=float)
+        self.floor_lookup = np.array([rates["floor_fees"][floor] for floor in FLOOR_TYPES], dtype=float)
+
+
+def compile_rate_card(card=None):
+    return QuoteEvaluator(effective_rates(card))
+
+
+DEFAULT_EVALUATOR = compile_rate_card()
+
+
+@timed("quote")
+def calculate_quote(data: dict, evaluator=None):
+    """Memoized price_quote; equivalent inputs under the same rates share one cache entry."""
+    evaluator = evaluator or DEFAULT_EVALUATOR
+    inputs = normalize_quote_input(data)
+    key = (evaluator.key, *inputs.values())
+    quote = quote_cache.get(key)
+    if quote is None:
+        quote = evaluator.price(inputs)
+        quote_cache.set(key, quote)
+    return dict(quote)
+
+
+def price_quote(data: dict, evaluator=None):
+    return (evaluator or DEFAULT_EVALUATOR).price(data)
+
+
+def quote_columns(rows):
+    """Pivot a list of calculate_quote input dicts into the columnar form calculate_quotes takes."""
+    columns = {key: [row[key] for row in rows] for key in QUOTE_COLUMNS}
+    for key, default in OPTIONAL_QUOTE_COLUMNS.items():
+        columns[key] = [row.get(key, default) for row in rows]
+    return columns
+
+
+def _lookup(table, levels):
+    # Fractional levels miss the scalar path's level tables too, so they take the fallback slot
+    levels = np.asarray(levels, dtype=float)
+    fallback = len(table) - 1
+    in_range = (levels >= 0) & (levels < fallback) & (levels == np.floor(levels))
+    return table[np.where(in_range, levels, fallback).astype(np.int64)]
+
+
+@timed("quote_batch")
+def calculate_quotes(columns: dict, evaluator=None):
+    """Vectorized calculate_quote over columnar inputs.
+
+    Takes the same keys as calculate_quote, each holding an array-like of
+    equal length (``state`` may also be one code for every row), and
+    returns the same result keys as float64 arrays.
+    """
+    evaluator = evaluator or DEFAULT_EVALUATOR
+    rates = evaluator.rates
+    sqft = np.asarray(columns['square_footage'], dtype=float)
+    size = len(sqft)
+
+    def column(key, default=0):
+        if key not in columns:
+            return np.full(size, default, dtype=float)
+        return np.asarray(columns[key], dtype=float)
+
+    pets = column('num_pets')
+    num_windows = column('num_windows')
+    outside_windows = column('windows_outside').astype(bool)
+    travel_miles = column('travel_miles')
+    unknown = len(evaluator.state_index)
+    if isinstance(columns['state'], str):
+        states = np.full(size, evaluator.state_index.get(columns['state'].upper(), unknown), dtype=np.intp)
+    else:
+        states = np.array(
+            [evaluator.state_index.get(str(code).upper(), unknown) for code in columns['state']], dtype=np.intp
+        )
+
+    floors = np.stack([column(f'floor_{floor}') for floor in FLOOR_TYPES], axis=1)
+    floor_fee = floors @ evaluator.floor_lookup
+    knick_fee = _lookup(evaluator.knickknack_lookup, column('knickknack'))
+
+    base = sqft * rates['sqft_rate']
+    pet_fee = pets * rates['pet_fee']
+    window_fee = num_windows * np.where(outside_windows, rates['outside_window_fee'], rates['window_fee'])
+    travel_fee = travel_miles * 2 * rates['travel_rate']
+    multiplier = _lookup(evaluator.cleanliness_lookup, column('cleanliness'))
 
     subtotal = (base + pet_fee + floor_fee + window_fee + knick_fee + travel_fee) * multiplier
-    tax = subtotal * get_state_tax(state)
+    tax = subtotal * evaluator.tax_lookup[states]
     total = subtotal + tax
 
     return {
@@ -74,6 +305,56 @@ def calculate_quote(data: dict):
         "subtotal": subtotal,
         "tax": tax,
         "total": total,
-        "biweekly": total * 0.5,
-        "weekly": total * 0.333
-    }
\ No newline at end of file
+        "biweekly": total * rates['biweekly_factor'],
+        "weekly": total * rates['weekly_factor']
+    }
+
+
+def quote_rows(quotes: dict):
+    """Split calculate_quotes output back into one plain-float dict per quote."""
+    keys = list(quotes)
+    return [dict(zip(keys, values)) for values in zip(*(quotes[key].tolist() for key in keys))]
+
+
+def _sweep_values(dimension, spec):
+    if isinstance(spec, dict):
+        start, stop, step = float(spec['start']), float(spec['stop']), float(spec['step'])
+        if step <= 0 or stop < start:
+            raise ValueError(f"{dimension} range needs start <= stop and a positive step")
+        if (stop - start) / step >= MAX_SWEEP_CELLS:
+            raise ValueError(f"{dimension} range has too many steps")
+        values = np.arange(start, stop + step / 2, step)
+    else:
+        values = np.asarray(spec, dtype=float)
+    if values.ndim != 1 or not len(values):
+        raise ValueError(f"{dimension} needs at least one value")
+    if (values < 0).any():
+        raise ValueError(f"{dimension} values must not be negative")
+    if dimension in ("cleanliness", "num_pets") and (values != np.round(values)).any():
+        raise ValueError(f"{dimension} values must be whole numbers")
+    return values
+
+
+def price_sweep(base: dict, axes: dict, evaluator=None):
+    """One-time, biweekly and weekly totals over every combination of ``axes`` values.
+
+    ``axes`` maps some of SWEEP_DIMENSIONS to a list of values or a
+    {"start", "stop", "step"} range; every other input comes from ``base``.
+    Returns (axis values, totals), each totals array having one dimension
+    per axis in the order given. Raises ValueError for an invalid sweep.
+    """
+    if not axes or set(axes) - set(SWEEP_DIMENSIONS):
+        raise ValueError(f"axes must be among: {', '.join(SWEEP_DIMENSIONS)}")
+    values = {dimension: _sweep_values(dimension, spec) for dimension, spec in axes.items()}
+    shape = tuple(len(v) for v in values.values())
+    if np.prod(shape, dtype=np.int64) > MAX_SWEEP_CELLS:
+        raise ValueError(f"sweep is limited to {MAX_SWEEP_CELLS} prices")
+    inputs = normalize_quote_input({**base, **{dimension: v[0] for dimension, v in values.items()}})
+    size = int(np.prod(shape))
+    columns = {key: np.full(size, value, dtype=float) for key, value in inputs.items() if key != "state"}
+    columns["state"] = inputs["state"]
+    for dimension, grid in zip(values, np.meshgrid(*values.values(), indexing="ij")):
+        columns[dimension] = grid.ravel()
+    quotes = calculate_quotes(columns, evaluator)
+    return values, {key: quotes[key].reshape(shape) for key in ("total", "biweekly", "weekly")}
+
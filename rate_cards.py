@@ -0,0 +1,57 @@
+import os
+
+from cache import LRUCache
+from database import db
+from quote_engine import DEFAULT_EVALUATOR, effective_rates, QuoteEvaluator, rate_card_key
+from utils.logger import log_event
+
+RATE_CARD_CACHE_SIZE = int(os.getenv("RATE_CARD_CACHE_SIZE", "4096"))
+
+
+class RateCards:
+    """Compiled quote evaluators per owner, recompiled only when the owner's rate card changes.
+
+    An owner's entry is trusted while their business_profiles version is
+    unchanged, so the hot path is one counter read. A profile edit re-reads
+    the card, and identical cards (most owners keep the defaults) share one
+    compiled evaluator.
+    """
+
+    def __init__(self, maxsize=RATE_CARD_CACHE_SIZE):
+        self._owners = LRUCache(maxsize=maxsize)    # owner_id -> (profile version, evaluator)
+        self._compiled = LRUCache(maxsize=maxsize)  # rate card key -> evaluator
+        self.compiles = 0
+
+    def compile(self, card):
+        if card is None:
+            return DEFAULT_EVALUATOR
+        rates = effective_rates(card)
+        key = rate_card_key(rates)
+        evaluator = self._compiled.get(key)
+        if evaluator is None:
+            evaluator = QuoteEvaluator(rates)
+            self._compiled.set(key, evaluator)
+            self.compiles += 1
+        return evaluator
+
+    def evaluator(self, owner_id):
+        # Read the version first: an edit racing this lookup leaves it stale, forcing a re-read
+        version = db["versions"].get(owner_id, "business_profiles")
+        entry = self._owners.get(owner_id)
+        if entry and entry[0] == version:
+            return entry[1]
+        profile = db["business_profiles"].get(owner_id)
+        try:
+            evaluator = self.compile(profile.rate_card if profile else None)
+        except ValueError as e:
+            # A card saved before validation tightened: quote on the defaults rather than fail every request
+            log_event("Invalid rate card, using default rates", level="warning", user_id=owner_id, error=e)
+            evaluator = DEFAULT_EVALUATOR
+        self._owners.set(owner_id, (version, evaluator))
+        return evaluator
+
+    def stats(self):
+        return {"compiles": self.compiles, "owners": self._owners.stats(), "compiled": len(self._compiled)}
+
+
+rate_cards = RateCards()
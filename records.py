@@ -0,0 +1,172 @@
+import json
+import struct
+import sys
+from operator import attrgetter
+
+from models import Bid, Client, CleaningFrequency
+from quote_engine import OPTIONAL_QUOTE_COLUMNS, QUOTE_COLUMNS, normalize_quote_input
+
+# calculate_quote result keys, packed as float64s in this order
+QUOTE_FIELDS = (
+    "base_rate", "pet_fee", "floor_fee", "window_fee", "knickknack_fee", "travel_fee",
+    "cleanliness_multiplier", "subtotal", "tax", "total", "biweekly", "weekly",
+)
+QUOTE_STRUCT = struct.Struct(f"<{len(QUOTE_FIELDS)}d")
+# normalize_quote_input keys, stored as a tuple in this order
+QUOTE_INPUT_FIELDS = QUOTE_COLUMNS + tuple(OPTIONAL_QUOTE_COLUMNS)
+
+FREQUENCIES = {f.value: f for f in CleaningFrequency}
+
+
+def pack_quote(quote):
+    if quote is None:
+        return None
+    return QUOTE_STRUCT.pack(*(quote[key] for key in QUOTE_FIELDS))
+
+
+def unpack_quote(packed):
+    if packed is None:
+        return None
+    return dict(zip(QUOTE_FIELDS, QUOTE_STRUCT.unpack(packed)))
+
+
+def pack_quote_input(data):
+    if data is None:
+        return None
+    values = normalize_quote_input(data)
+    values["state"] = sys.intern(values["state"])
+    return tuple(values[key] for key in QUOTE_INPUT_FIELDS)
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record:
+    """Slotted storage form of an API model, with pydantic-style dict()/json() serializers.
+
+    The stores keep these instead of pydantic models; validation happens
+    once at the API boundary when the model is built from the request.
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+    _values = None
+
+    def dict(self, include=None, exclude=None):
+        values = self._values(self)
+        if include is None and not exclude:
+            return dict(zip(self.FIELDS, values))
+        # Like pydantic, an empty include selects nothing while an empty exclude drops nothing
+        return {
+            name: value for name, value in zip(self.FIELDS, values)
+            if (include is None or name in include) and (not exclude or name not in exclude)
+        }
+
+    def json(self, include=None, exclude=None):
+        return json.dumps(self.dict(include, exclude))
+
+    @classmethod
+    def parse_raw(cls, data):
+        return cls(**json.loads(data))
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(**{name: getattr(model, name) for name in cls.FIELDS})
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self._values(self) == other._values(other)
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.dict().items())
+        return f"{type(self).__name__}({fields})"
+
+
+class ClientRecord(Record):
+    __slots__ = ("client_id", "owner_id", "name", "contact_email", "contact_number", "cleaning_frequency")
+    FIELDS = __slots__
+    _values = attrgetter(*FIELDS)
+
+    def __init__(self, client_id, owner_id, name, contact_email, contact_number, cleaning_frequency):
+        self.client_id = _intern(client_id)
+        self.owner_id = _intern(owner_id)
+        self.name = name
+        self.contact_email = contact_email
+        self.contact_number = contact_number
+        # Enum members are singletons, so every client shares the same three objects
+        self.cleaning_frequency = FREQUENCIES[getattr(cleaning_frequency, "value", cleaning_frequency)]
+
+    def to_model(self):
+        return Client.construct(**self.dict())
+
+
+class BidRecord(Record):
+    """A bid with its quote packed into QUOTE_STRUCT and its quote inputs in a tuple.
+
+    ``quote_data`` and ``quote_input`` still read and write as dicts, so
+    callers (PDFs, repricing, serializers) see the same shape as ``Bid``.
+    """
+
+    __slots__ = (
+        "bid_id", "owner_id", "client_id", "bid_address", "notes", "before_photos", "after_photos",
+        "_quote_input", "_quote", "signed_contract", "created_at",
+    )
+    FIELDS = (
+        "bid_id", "owner_id", "client_id", "bid_address", "notes", "before_photos", "after_photos",
+        "quote_input", "quote_data", "signed_contract", "created_at",
+    )
+    _values = attrgetter(*FIELDS)
+
+    def __init__(self, bid_id, owner_id, client_id, bid_address, notes, before_photos=(), after_photos=(),
+                 quote_input=None, quote_data=None, signed_contract=None, created_at=None):
+        self.bid_id = bid_id
+        self.owner_id = _intern(owner_id)
+        self.client_id = _intern(client_id)
+        self.bid_address = bid_address
+        self.notes = notes
+        # The empty tuple is shared, so photo-less bids cost nothing here
+        self.before_photos = tuple(before_photos)
+        self.after_photos = tuple(after_photos)
+        self._quote_input = pack_quote_input(quote_input)
+        self._quote = pack_quote(quote_data)
+        self.signed_contract = signed_contract
+        self.created_at = created_at
+
+    @property
+    def quote_input(self):
+        packed = self._quote_input
+        return None if packed is None else dict(zip(QUOTE_INPUT_FIELDS, packed))
+
+    @quote_input.setter
+    def quote_input(self, value):
+        self._quote_input = pack_quote_input(value)
+
+    @property
+    def quote_data(self):
+        return unpack_quote(self._quote)
+
+    @quote_data.setter
+    def quote_data(self, value):
+        self._quote = pack_quote(value)
+
+    @property
+    def maps_link(self):
+        return f"https://www.google.com/maps/search/?api=1&query={self.bid_address.replace(' ', '+')}"
+
+    def dict(self, include=None, exclude=None):
+        data = super().dict(include, exclude)
+        for key in ("before_photos", "after_photos"):
+            if key in data:
+                data[key] = list(data[key])
+        return data
+
+    def to_model(self):
+        return Bid.construct(**self.dict())
+
+
+def client_record(client):
+    return client if isinstance(client, ClientRecord) else ClientRecord.from_model(client)
+
+
+def bid_record(bid):
+    return bid if isinstance(bid, BidRecord) else BidRecord.from_model(bid)
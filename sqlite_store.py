@@ -0,0 +1,382 @@
+import json
+import os
+import queue
+import sqlite3
+import uuid
+from contextlib import contextmanager
+
+from models import BusinessProfile
+from records import BidRecord, ClientRecord, bid_record, client_record
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    cleaning_frequency TEXT NOT NULL,
+    data TEXT NOT NULL,
+    UNIQUE (owner_id, client_id)
+);
+CREATE INDEX IF NOT EXISTS clients_by_owner ON clients (owner_id, seq);
+CREATE INDEX IF NOT EXISTS clients_by_frequency ON clients (owner_id, cleaning_frequency, seq);
+
+CREATE TABLE IF NOT EXISTS bids (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id TEXT NOT NULL,
+    bid_id TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    UNIQUE (owner_id, bid_id)
+);
+CREATE INDEX IF NOT EXISTS bids_by_owner ON bids (owner_id, seq);
+CREATE INDEX IF NOT EXISTS bids_by_client ON bids (owner_id, client_id, seq);
+
+CREATE TABLE IF NOT EXISTS kv (
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (collection, key)
+);
+
+CREATE TABLE IF NOT EXISTS email_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id TEXT NOT NULL,
+    bid_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS email_log_by_bid ON email_log (owner_id, bid_id, seq);
+
+CREATE TABLE IF NOT EXISTS blob_refs (
+    path TEXT PRIMARY KEY,
+    refs INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS versions (
+    owner_id TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (owner_id, collection)
+) WITHOUT ROWID;
+"""
+
+_VERSION_GET = "SELECT version FROM versions WHERE owner_id = ? AND collection = ?"
+_VERSION_BUMP = """
+INSERT INTO versions (owner_id, collection, version) VALUES (?, ?, 1)
+ON CONFLICT (owner_id, collection) DO UPDATE SET version = version + 1
+"""
+_EPOCH_INIT = "INSERT OR IGNORE INTO kv (collection, key, value) VALUES ('meta', 'epoch', ?)"
+
+
+class ConnectionPool:
+    """A fixed set of WAL-mode connections shared by the worker's threads.
+
+    Statements are kept as module constants so sqlite3's per-connection
+    statement cache reuses the prepared form on every hot lookup.
+    """
+
+    def __init__(self, path, size=4):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(self._connect())
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+_GET_CLIENT = "SELECT data FROM clients WHERE owner_id = ? AND client_id = ?"
+_CLIENTS_FOR_OWNER = "SELECT data FROM clients WHERE owner_id = ? ORDER BY seq"
+_CLIENTS_PAGE = "SELECT seq, data FROM clients WHERE owner_id = ? AND seq > ? ORDER BY seq LIMIT ?"
+_CLIENTS_WITH_FREQUENCY = "SELECT data FROM clients WHERE owner_id = ? AND cleaning_frequency = ? ORDER BY seq"
+_UPSERT_CLIENT = """
+INSERT INTO clients (owner_id, client_id, cleaning_frequency, data) VALUES (?, ?, ?, ?)
+ON CONFLICT (owner_id, client_id) DO UPDATE SET
+    cleaning_frequency = excluded.cleaning_frequency, data = excluded.data
+"""
+_DELETE_CLIENT = "DELETE FROM clients WHERE owner_id = ? AND client_id = ? RETURNING data"
+
+
+class SQLiteVersions:
+    """Change counters per (owner_id, collection), bumped inside each write's transaction."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        # A recreated database file gets a new epoch, so old ETags never match it
+        with pool.transaction() as conn:
+            conn.execute(_EPOCH_INIT, (json.dumps(uuid.uuid4().hex[:8]),))
+            self.epoch = json.loads(conn.execute(_KV_GET, ("meta", "epoch")).fetchone()[0])
+
+    def bump(self, owner_id, collection):
+        with self._pool.transaction() as conn:
+            conn.execute(_VERSION_BUMP, (owner_id, collection))
+
+    def get(self, owner_id, collection):
+        with self._pool.connection() as conn:
+            row = conn.execute(_VERSION_GET, (owner_id, collection)).fetchone()
+        return row[0] if row else 0
+
+
+class SQLiteClientStore:
+    def __init__(self, pool):
+        self._pool = pool
+
+    @staticmethod
+    def _row(client):
+        client = client_record(client)
+        return (client.owner_id, client.client_id, client.cleaning_frequency.value, client.json())
+
+    def add(self, client):
+        with self._pool.transaction() as conn:
+            conn.execute(_UPSERT_CLIENT, self._row(client))
+            conn.execute(_VERSION_BUMP, (client.owner_id, "clients"))
+        return client
+
+    def add_many(self, clients):
+        rows = [self._row(c) for c in clients]
+        with self._pool.transaction() as conn:
+            conn.executemany(_UPSERT_CLIENT, rows)
+            conn.executemany(_VERSION_BUMP, [(owner_id, "clients") for owner_id in {r[0] for r in rows}])
+
+    def get(self, owner_id, client_id):
+        with self._pool.connection() as conn:
+            row = conn.execute(_GET_CLIENT, (owner_id, client_id)).fetchone()
+        return ClientRecord.parse_raw(row[0]) if row else None
+
+    def for_owner(self, owner_id):
+        with self._pool.connection() as conn:
+            rows = conn.execute(_CLIENTS_FOR_OWNER, (owner_id,)).fetchall()
+        return [ClientRecord.parse_raw(data) for data, in rows]
+
+    def page(self, owner_id, after=0, limit=50):
+        with self._pool.connection() as conn:
+            rows = conn.execute(_CLIENTS_PAGE, (owner_id, after, limit)).fetchall()
+        return [(seq, ClientRecord.parse_raw(data)) for seq, data in rows]
+
+    def with_frequency(self, owner_id, frequency):
+        with self._pool.connection() as conn:
+            rows = conn.execute(_CLIENTS_WITH_FREQUENCY, (owner_id, getattr(frequency, "value", frequency))).fetchall()
+        return [ClientRecord.parse_raw(data) for data, in rows]
+
+    def remove(self, owner_id, client_id):
+        with self._pool.transaction() as conn:
+            row = conn.execute(_DELETE_CLIENT, (owner_id, client_id)).fetchone()
+            if row:
+                conn.execute(_VERSION_BUMP, (owner_id, "clients"))
+        return ClientRecord.parse_raw(row[0]) if row else None
+
+
+_GET_BID = "SELECT data FROM bids WHERE owner_id = ? AND bid_id = ?"
+_BIDS_FOR_OWNER = "SELECT data FROM bids WHERE owner_id = ? ORDER BY seq"
+_BIDS_PAGE = "SELECT seq, data FROM bids WHERE owner_id = ? AND seq > ? ORDER BY seq LIMIT ?"
+_BIDS_PAGE_FOR_CLIENT = (
+    "SELECT seq, data FROM bids WHERE owner_id = ? AND client_id = ? AND seq > ? ORDER BY seq LIMIT ?"
+)
+_BIDS_FOR_CLIENT = "SELECT data FROM bids WHERE owner_id = ? AND client_id = ? ORDER BY seq"
+_UPSERT_BID = """
+INSERT INTO bids (owner_id, bid_id, client_id, data) VALUES (?, ?, ?, ?)
+ON CONFLICT (owner_id, bid_id) DO UPDATE SET client_id = excluded.client_id, data = excluded.data
+"""
+_DELETE_BID = "DELETE FROM bids WHERE owner_id = ? AND bid_id = ? RETURNING data"
+
+
+class SQLiteBidStore:
+    def __init__(self, pool):
+        self._pool = pool
+
+    @staticmethod
+    def _row(bid):
+        bid = bid_record(bid)
+        return (bid.owner_id, bid.bid_id, bid.client_id, bid.json())
+
+    def add(self, bid):
+        with self._pool.transaction() as conn:
+            conn.execute(_UPSERT_BID, self._row(bid))
+            conn.execute(_VERSION_BUMP, (bid.owner_id, "bids"))
+        return bid
+
+    update = add
+
+    def add_many(self, bids):
+        rows = [self._row(b) for b in bids]
+        with self._pool.transaction() as conn:
+            conn.executemany(_UPSERT_BID, rows)
+            conn.executemany(_VERSION_BUMP, [(owner_id, "bids") for owner_id in {r[0] for r in rows}])
+
+    def get(self, owner_id, bid_id):
+        with self._pool.connection() as conn:
+            row = conn.execute(_GET_BID, (owner_id, bid_id)).fetchone()
+        return BidRecord.parse_raw(row[0]) if row else None
+
+    def for_owner(self, owner_id):
+        with self._pool.connection() as conn:
+            rows = conn.execute(_BIDS_FOR_OWNER, (owner_id,)).fetchall()
+        return [BidRecord.parse_raw(data) for data, in rows]
+
+    def for_client(self, owner_id, client_id):
+        with self._pool.connection() as conn:
+            rows = conn.execute(_BIDS_FOR_CLIENT, (owner_id, client_id)).fetchall()
+        return [BidRecord.parse_raw(data) for data, in rows]
+
+    def page(self, owner_id, after=0, limit=50, client_id=None):
+        with self._pool.connection() as conn:
+            if client_id is None:
+                rows = conn.execute(_BIDS_PAGE, (owner_id, after, limit)).fetchall()
+            else:
+                rows = conn.execute(_BIDS_PAGE_FOR_CLIENT, (owner_id, client_id, after, limit)).fetchall()
+        return [(seq, BidRecord.parse_raw(data)) for seq, data in rows]
+
+    def remove(self, owner_id, bid_id):
+        with self._pool.transaction() as conn:
+            row = conn.execute(_DELETE_BID, (owner_id, bid_id)).fetchone()
+            if row:
+                conn.execute(_VERSION_BUMP, (owner_id, "bids"))
+        return BidRecord.parse_raw(row[0]) if row else None
+
+
+_missing = object()
+
+_KV_GET = "SELECT value FROM kv WHERE collection = ? AND key = ?"
+_KV_SET = """
+INSERT INTO kv (collection, key, value) VALUES (?, ?, ?)
+ON CONFLICT (collection, key) DO UPDATE SET value = excluded.value
+"""
+_KV_DELETE = "DELETE FROM kv WHERE collection = ? AND key = ?"
+_KV_INSERT = "INSERT INTO kv (collection, key, value) VALUES (?, ?, ?) ON CONFLICT (collection, key) DO NOTHING"
+
+
+class SQLiteMapping:
+    """Dict-style access to one kv collection, for profiles and subscriptions."""
+
+    def __init__(self, pool, collection, load=json.loads, dump=json.dumps, versioned=False):
+        self._pool = pool
+        self._collection = collection
+        self._load = load
+        self._dump = dump
+        # Owner-keyed collections bump the owner's version on every write
+        self._versioned = versioned
+
+    def get(self, key, default=None):
+        with self._pool.connection() as conn:
+            row = conn.execute(_KV_GET, (self._collection, key)).fetchone()
+        return self._load(row[0]) if row else default
+
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        with self._pool.transaction() as conn:
+            conn.execute(_KV_SET, (self._collection, key, self._dump(value)))
+            if self._versioned:
+                conn.execute(_VERSION_BUMP, (key, self._collection))
+
+    def __delitem__(self, key):
+        with self._pool.transaction() as conn:
+            conn.execute(_KV_DELETE, (self._collection, key))
+            if self._versioned:
+                conn.execute(_VERSION_BUMP, (key, self._collection))
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def setdefault(self, key, default=None):
+        # The first writer wins, so concurrent workers all end up with its value
+        with self._pool.transaction() as conn:
+            conn.execute(_KV_INSERT, (self._collection, key, self._dump(default)))
+            row = conn.execute(_KV_GET, (self._collection, key)).fetchone()
+        return self._load(row[0])
+
+
+_LOG_APPEND = "INSERT INTO email_log (owner_id, bid_id, data) VALUES (?, ?, ?)"
+_LOG_FOR_BID = "SELECT data FROM email_log WHERE owner_id = ? AND bid_id = ? ORDER BY seq"
+
+
+class SQLiteEmailLog:
+    def __init__(self, pool):
+        self._pool = pool
+
+    def append(self, owner_id, bid_id, entry):
+        with self._pool.transaction() as conn:
+            conn.execute(_LOG_APPEND, (owner_id, bid_id, json.dumps(entry)))
+
+    def for_bid(self, owner_id, bid_id):
+        with self._pool.connection() as conn:
+            rows = conn.execute(_LOG_FOR_BID, (owner_id, bid_id)).fetchall()
+        return [json.loads(data) for data, in rows]
+
+
+_REFS_INCR = """
+INSERT INTO blob_refs (path, refs) VALUES (?, ?)
+ON CONFLICT (path) DO UPDATE SET refs = refs + excluded.refs
+RETURNING refs
+"""
+_REFS_DECR = "UPDATE blob_refs SET refs = refs - ? WHERE path = ? RETURNING refs"
+_REFS_DROP = "DELETE FROM blob_refs WHERE path = ? AND refs <= 0"
+_REFS_GET = "SELECT refs FROM blob_refs WHERE path = ?"
+
+
+class SQLiteRefCounts:
+    def __init__(self, pool):
+        self._pool = pool
+
+    def incr(self, key, amount=1):
+        with self._pool.transaction() as conn:
+            return conn.execute(_REFS_INCR, (key, amount)).fetchone()[0]
+
+    def decr(self, key, amount=1):
+        with self._pool.transaction() as conn:
+            row = conn.execute(_REFS_DECR, (amount, key)).fetchone()
+            conn.execute(_REFS_DROP, (key,))
+        return max(row[0], 0) if row else 0
+
+    def get(self, key):
+        with self._pool.connection() as conn:
+            row = conn.execute(_REFS_GET, (key,)).fetchone()
+        return row[0] if row else 0
+
+
+def open_sqlite_db(path, pool_size=4):
+    pool = ConnectionPool(path, size=pool_size)
+    return {
+        "business_profiles": SQLiteMapping(
+            pool, "business_profiles", BusinessProfile.parse_raw, lambda p: p.json(), versioned=True
+        ),
+        "clients": SQLiteClientStore(pool),
+        "bids": SQLiteBidStore(pool),
+        "subscriptions": SQLiteMapping(pool, "subscriptions", versioned=True),
+        "email_log": SQLiteEmailLog(pool),
+        "blob_refs": SQLiteRefCounts(pool),
+        "calendar_tokens": SQLiteMapping(pool, "calendar_tokens"),
+        "settings": SQLiteMapping(pool, "settings"),
+        "versions": SQLiteVersions(pool),
+        "pool": pool,
+    }
@@ -1,17 +1,116 @@
+import struct
+
 import cv2
 import numpy as np
 
-def estimate_area_from_image(image_path, known_width_inches=120):
-    image = cv2.imread(image_path)
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+# Edge and contour detection run on an image no larger than this on its long side
+MAX_EDGE_DIMENSION = 1024
+
+
+def _encoded_size(data):
+    """(width, height) read from a PNG or JPEG header without decoding, or None."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        # SOF0-SOF15, excluding DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def _decode(data):
+    """Grayscale image plus the factor it was reduced by while decoding."""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    size = _encoded_size(data)
+    if size:
+        # Let the decoder skip detail we would throw away anyway (JPEG DCT scaling)
+        for factor, flag in ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                             (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)):
+            if max(size) / factor >= MAX_EDGE_DIMENSION:
+                image = cv2.imdecode(buffer, flag)
+                if image is not None:
+                    # Not shape / size: the decoder applies EXIF orientation, the header size does not
+                    return image, 1 / factor
+    return cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE), 1.0
+
+
+def load_grayscale(source):
+    """Grayscale image and its scale relative to the original, from a path, bytes, buffer or array."""
+    if isinstance(source, np.ndarray):
+        image = source if source.ndim == 2 else cv2.cvtColor(source, cv2.COLOR_BGR2GRAY)
+        return image, 1.0
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return _decode(bytes(source))
+    with open(source, "rb") as f:
+        return _decode(f.read())
+
+
+def no_room_detected(reason):
+    return {"detected": False, "estimated_area_sqft": None, "reason": reason}
+
+
+def estimate_area_from_image(image, known_width_inches=120):
+    """Estimate a room's floor area from a photo.
+
+    ``image`` may be a file path, raw encoded bytes, a file-like object or a
+    decoded array. Edges and contours are found on a copy downscaled to
+    MAX_EDGE_DIMENSION and the bounding box is mapped back to full scale.
+    """
+    gray, scale = load_grayscale(image)
+    if gray is None:
+        return no_room_detected("Image could not be decoded")
+    longest = max(gray.shape[:2])
+    if longest > MAX_EDGE_DIMENSION:
+        factor = MAX_EDGE_DIMENSION / longest
+        gray = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+        scale *= factor
+
     blurred = cv2.GaussianBlur(gray, (7,7), 0)
     edged = cv2.Canny(blurred, 50, 100)
 
     contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return no_room_detected("No room outline detected")
     largest = max(contours, key=cv2.contourArea)
     x,y,w,h = cv2.boundingRect(largest)
+    if w == 0 or h == 0:
+        return no_room_detected("No room outline detected")
+    x, y, w, h = x / scale, y / scale, w / scale, h / scale
 
     pixels_per_inch = w / known_width_inches
     area_sq_inches = (w / pixels_per_inch) * (h / pixels_per_inch)
     area_sq_ft = area_sq_inches / 144
-    return round(area_sq_ft, 2)
\ No newline at end of file
+    return {
+        "detected": True,
+        "estimated_area_sqft": round(area_sq_ft, 2),
+        "bounding_box": [round(x), round(y), round(w), round(h)],
+    }
+
+
+def perceptual_hash(image):
+    """64-bit difference hash (dHash) of a photo, or None if it cannot be decoded.
+
+    Re-encoded, resized or slightly re-framed copies of a shot land within a
+    few bits of each other.
+    """
+    gray = None
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        gray = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        gray, _ = load_grayscale(image)
+    if gray is None:
+        return None
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
@@ -0,0 +1,61 @@
+import json
+import os
+import uuid
+
+import pytest
+
+# Tokens for the API tests are signed locally; set before main is imported
+os.environ["HCA_AUTH_VERIFIER"] = "local"
+os.environ["HCA_LOCAL_AUTH_KEYS"] = json.dumps({"test": "test-secret"})
+
+BACKENDS = ("memory", "sqlite")
+
+
+def open_store(backend, directory):
+    import database
+    from sqlite_store import open_sqlite_db
+
+    if backend == "memory":
+        return database._memory_db()
+    return open_sqlite_db(os.path.join(directory, "hca.sqlite3"))
+
+
+def close_store(store):
+    if "pool" in store:
+        store["pool"].close()
+
+
+@pytest.fixture(params=BACKENDS)
+def store(request, tmp_path):
+    """A fresh, empty set of stores for one backend."""
+    store = open_store(request.param, str(tmp_path))
+    yield store
+    close_store(store)
+
+
+@pytest.fixture(params=BACKENDS)
+def api(request, tmp_path, monkeypatch):
+    """TestClient for the app running on a fresh memory or SQLite database, with uploads under tmp_path."""
+    import database
+    import main
+    from fastapi.testclient import TestClient
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("uploads")
+    previous = dict(database.db)
+    database.db.clear()
+    database.db.update(open_store(request.param, str(tmp_path)))
+    try:
+        with TestClient(main.app) as client:
+            yield client
+    finally:
+        database.db.clear()
+        database.db.update(previous)
+
+
+@pytest.fixture
+def owner():
+    """Authorization headers for a new owner."""
+    from firebase_auth import verifier
+
+    return {"Authorization": f"Bearer {verifier.issue(f'owner-{uuid.uuid4().hex}')}"}
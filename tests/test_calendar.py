@@ -0,0 +1,49 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from models import Bid, BusinessProfile, Client, CleaningFrequency
+from utils.calendar import generate_ics
+
+BUSINESS = BusinessProfile(owner_id="u1", business_name="Sparkle", business_address="1 Main St",
+                           contact_email="owner@example.com", contact_number="555-0100")
+CLIENT = Client(client_id="c1", owner_id="u1", name="Jamie", contact_email="jamie@example.com",
+                contact_number="555-0199", cleaning_frequency=CleaningFrequency.weekly)
+
+
+def _bid(signed_contract=None):
+    return Bid(bid_id="b1", owner_id="u1", client_id="c1", bid_address="2 Elm St", notes="",
+               signed_contract=signed_contract)
+
+
+def test_signed_contract_recurs_from_the_morning_after_signing():
+    ics = generate_ics(BUSINESS, CLIENT, _bid({"name": "Jamie", "timestamp": "2026-03-02T15:30:00"}))
+    assert b"DTSTART:20260303T090000" in ics
+    assert b"RRULE:FREQ=WEEKLY" in ics
+
+
+def test_unsigned_bid_has_no_event():
+    with pytest.raises(ValueError):
+        generate_ics(BUSINESS, CLIENT, _bid())
+
+
+def test_unsigned_bid_calendar_route_is_rejected():
+    import main
+    from firebase_auth import verifier
+
+    headers = {"Authorization": f"Bearer {verifier.issue('calendar-owner')}"}
+    with TestClient(main.app) as client:
+        client.post("/profile", headers=headers, data={
+            "business_name": "Sparkle", "business_address": "1 Main St",
+            "contact_email": "owner@example.com", "contact_number": "555-0100",
+        })
+        client_id = client.post("/client", headers=headers, data={
+            "name": "Jamie", "contact_email": "jamie@example.com", "contact_number": "555-0199",
+            "cleaning_frequency": "weekly",
+        }).json()["client"]["client_id"]
+        bid_id = client.post("/bid", headers=headers, data={
+            "client_id": client_id, "bid_address": "2 Elm St", "notes": "Two dogs", "total_sqft": 1200, "num_pets": 0,
+            "num_windows": 6, "cleanliness": 2, "travel_miles": 5, "state": "TX",
+        }).json()["bid"]["bid_id"]
+
+        response = client.get(f"/calendar/contract/{client_id}/{bid_id}", headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+
+CLIENT = {"name": "Jamie", "contact_email": "jamie@example.com", "contact_number": "555-0199",
+          "cleaning_frequency": "weekly"}
+BID = {"bid_address": "2 Elm St", "notes": "Two dogs", "total_sqft": 1200, "num_pets": 2, "num_windows": 6,
+       "cleanliness": 2, "travel_miles": 5, "state": "TX"}
+
+
+def _etag(api, owner, url):
+    response = api.get(url, headers=owner)
+    assert response.status_code == 200
+    return response.headers["etag"]
+
+
+def _add_client(api, owner):
+    return api.post("/client", headers=owner, data=CLIENT).json()["client"]["client_id"]
+
+
+def test_matching_etag_is_not_modified(api, owner):
+    _add_client(api, owner)
+    etag = _etag(api, owner, "/clients")
+    response = api.get("/clients", headers={**owner, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_client_add_and_delete_change_the_etag(api, owner):
+    first = _etag(api, owner, "/clients")
+    client_id = _add_client(api, owner)
+    added = _etag(api, owner, "/clients")
+    assert added != first
+    assert api.get("/clients", headers={**owner, "If-None-Match": first}).status_code == 200
+
+    api.delete(f"/client/{client_id}", headers=owner)
+    deleted = _etag(api, owner, "/clients")
+    assert deleted not in (first, added)
+    assert api.get("/clients", headers={**owner, "If-None-Match": added}).status_code == 200
+
+
+def test_bid_add_sign_and_delete_change_the_etag(api, owner):
+    client_id = _add_client(api, owner)
+    empty = _etag(api, owner, "/bids")
+    bid_id = api.post("/bid", headers=owner, data={**BID, "client_id": client_id}).json()["bid"]["bid_id"]
+    added = _etag(api, owner, "/bids")
+
+    signature = cv2.imencode(".png", np.full((40, 120), 255, np.uint8))[1].tobytes()
+    response = api.post(f"/sign-contract/{client_id}/{bid_id}", headers=owner, data={"name": "Jamie"},
+                        files={"signature": ("signature.png", signature, "image/png")})
+    assert response.status_code == 200
+    signed = _etag(api, owner, "/bids")
+    assert api.get("/bids", headers={**owner, "If-None-Match": added}).status_code == 200
+
+    api.delete(f"/bid/{bid_id}", headers=owner)
+    deleted = _etag(api, owner, "/bids")
+    assert len({empty, added, signed, deleted}) == 4
+
+
+def test_views_of_one_collection_have_distinct_etags(api, owner):
+    _add_client(api, owner)
+    etags = {_etag(api, owner, url) for url in (
+        "/clients", "/clients?limit=1", "/clients?limit=2", "/clients?fields=client_id,name",
+    )}
+    assert len(etags) == 4
+
+
+def test_other_owners_writes_keep_the_etag(api, owner):
+    from firebase_auth import verifier
+
+    _add_client(api, owner)
+    etag = _etag(api, owner, "/clients")
+    _add_client(api, {"Authorization": f"Bearer {verifier.issue('someone-else')}"})
+    assert api.get("/clients", headers={**owner, "If-None-Match": etag}).status_code == 304
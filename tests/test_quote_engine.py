@@ -0,0 +1,29 @@
+import pytest
+
+from quote_engine import calculate_quote, calculate_quotes, quote_columns, quote_rows
+
+BASE = {
+    "square_footage": 1000, "num_pets": 1, "num_windows": 3, "cleanliness": 2, "travel_miles": 4, "state": "CA",
+}
+
+
+@pytest.mark.parametrize("overrides", [
+    {},
+    {"cleanliness": 2.5},
+    {"cleanliness": 7},
+    {"cleanliness": -1},
+    {"knickknack": 1.5},
+    {"knickknack": 3, "floor_tile": True, "windows_outside": True},
+    {"state": "zz"},
+])
+def test_batch_matches_scalar(overrides):
+    row = {**BASE, **overrides}
+    batch = quote_rows(calculate_quotes(quote_columns([row])))[0]
+    scalar = calculate_quote(row)
+    assert batch == pytest.approx(scalar)
+
+
+def test_empty_batch():
+    quotes = calculate_quotes(quote_columns([]))
+    assert quotes["total"].shape == (0,)
+    assert quote_rows(quotes) == []
@@ -0,0 +1,66 @@
+import math
+
+import pytest
+
+from quote_engine import DEFAULT_RATES, effective_rates
+
+QUOTE = {"square_footage": 1000, "num_pets": 1, "num_windows": 3, "cleanliness": 2, "travel_miles": 4, "state": "CA"}
+PROFILE = {"business_name": "Sparkle", "business_address": "1 Main St", "contact_email": "owner@example.com",
+           "contact_number": "555-0100"}
+
+
+@pytest.mark.parametrize("card", [
+    {"sqft_rate": math.nan},
+    {"pet_fee": math.inf},
+    {"floor_fees": {"tile": math.nan}},
+    {"knickknack_fees": [0, 10, math.inf, 20]},
+    {"cleanliness_multipliers": [1, 1.05, math.nan, 1.2, 1.3, 1.5]},
+    {"tax_rates": {"CA": math.nan}},
+    {"weekly_factor": -math.inf},
+])
+def test_non_finite_rates_are_rejected(card):
+    with pytest.raises(ValueError):
+        effective_rates(card)
+
+
+def test_unset_fields_keep_the_defaults():
+    rates = effective_rates({"sqft_rate": 0.2, "tax_rates": {"ca": 0.1}})
+    assert rates["sqft_rate"] == 0.2
+    assert rates["tax_rates"]["CA"] == 0.1
+    assert rates["tax_rates"]["TX"] == DEFAULT_RATES["tax_rates"]["TX"]
+    assert rates["pet_fee"] == DEFAULT_RATES["pet_fee"]
+
+
+def _total(api, headers):
+    response = api.post("/calculate-quote", headers=headers, json=QUOTE)
+    assert response.status_code == 200
+    return response.json()["quote"]["total"]
+
+
+def test_card_prices_only_its_owner(api, owner):
+    from firebase_auth import verifier
+
+    other = {"Authorization": f"Bearer {verifier.issue('default-rates-owner')}"}
+    default = _total(api, owner)
+    assert _total(api, other) == default
+
+    api.post("/profile", headers=owner, data=PROFILE)
+    assert api.put("/rate-card", headers=owner, json={"sqft_rate": 0.2}).status_code == 200
+    assert _total(api, owner) == pytest.approx(default + 1000 * (0.2 - DEFAULT_RATES["sqft_rate"]) * 1.1 * 1.0625)
+    assert _total(api, other) == default
+
+    batch = api.post("/calculate-quote/batch", headers=owner, json={k: [v] for k, v in QUOTE.items()}).json()
+    assert batch["quotes"]["total"] == [pytest.approx(_total(api, owner))]
+
+    api.delete("/rate-card", headers=owner)
+    assert _total(api, owner) == default
+
+
+@pytest.mark.parametrize("body", ['{"sqft_rate": NaN}', '{"sqft_rate": 1e999}', '{"tax_rates": {"CA": NaN}}'])
+def test_non_finite_card_is_refused_and_not_saved(api, owner, body):
+    api.post("/profile", headers=owner, data=PROFILE)
+    default = _total(api, owner)
+    response = api.put("/rate-card", headers={**owner, "Content-Type": "application/json"}, content=body)
+    assert response.status_code == 400
+    assert api.get("/rate-card", headers=owner).json()["custom"] is False
+    assert _total(api, owner) == default
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from models import Bid, Client, CleaningFrequency
+from pagination import dump_records
+from quote_engine import normalize_quote_input, price_quote
+
+QUOTE_INPUT = normalize_quote_input({
+    "square_footage": 1200, "num_pets": 2, "num_windows": 6, "cleanliness": 2, "travel_miles": 5, "state": "tx",
+    "floor_tile": True, "knickknack": 1,
+})
+
+CLIENT = Client(client_id="c1", owner_id="u1", name="Jamie", contact_email="jamie@example.com",
+                contact_number="555-0199", cleaning_frequency=CleaningFrequency.bimonthly)
+BIDS = [
+    Bid(bid_id="b1", owner_id="u1", client_id="c1", bid_address="2 Elm St", notes="Two dogs",
+        before_photos=["uploads/blobs/ab/ab.jpg", "uploads/blobs/cd/cd.png"], after_photos=["uploads/blobs/ef/ef.jpg"],
+        quote_input=QUOTE_INPUT, quote_data=price_quote(QUOTE_INPUT),
+        signed_contract={"name": "Jamie", "timestamp": "2026-03-02T15:30:00", "signature_path": "uploads/s.png"},
+        created_at="2026-03-01T10:00:00"),
+    Bid(bid_id="b2", owner_id="u1", client_id="c1", bid_address="3 Oak Ave", notes=""),
+]
+PROJECTIONS = [
+    ({"bid_id", "quote_data", "created_at"}, None),
+    (None, {"quote_data", "before_photos", "after_photos"}),
+    ({"client_id", "name"}, None),
+    (None, {"contact_email"}),
+]
+
+
+def _plain(value):
+    # Stored quotes come back as float64s; compare them as JSON numbers
+    return json.loads(json.dumps(value))
+
+
+def test_client_round_trip(store):
+    store["clients"].add(CLIENT)
+    stored = store["clients"].get("u1", "c1")
+    assert stored.dict() == CLIENT.dict()
+    assert json.loads(stored.json()) == json.loads(CLIENT.json())
+    assert [c.dict() for c in store["clients"].for_owner("u1")] == [CLIENT.dict()]
+
+
+@pytest.mark.parametrize("bid", BIDS, ids=lambda b: b.bid_id)
+def test_bid_round_trip(store, bid):
+    store["bids"].add(bid)
+    stored = store["bids"].get("u1", bid.bid_id)
+    assert _plain(stored.dict()) == _plain(bid.dict())
+    assert json.loads(stored.json()) == _plain(bid.dict())
+    assert isinstance(stored.dict()["before_photos"], list)
+    assert stored.maps_link == bid.maps_link
+
+
+def test_bid_without_quote_keeps_none(store):
+    store["bids"].add(BIDS[1])
+    stored = store["bids"].get("u1", "b2")
+    assert stored.quote_data is None and stored.quote_input is None
+    assert stored.dict()["created_at"] is None
+
+
+@pytest.mark.parametrize("include, exclude", PROJECTIONS)
+def test_projection_matches_the_model(store, include, exclude):
+    store["clients"].add(CLIENT)
+    for bid in BIDS:
+        store["bids"].add(bid)
+    for model, stored in [(CLIENT, store["clients"].get("u1", "c1")), *(
+        (bid, store["bids"].get("u1", bid.bid_id)) for bid in BIDS
+    )]:
+        keep = include and include & set(type(model).__fields__)
+        assert _plain(stored.dict(keep, exclude)) == _plain(model.dict(include=keep, exclude=exclude))
+
+    dumped = json.loads(dump_records(store["bids"].for_owner("u1"), include, exclude))
+    assert dumped == [_plain(bid.dict(include=include, exclude=exclude)) for bid in BIDS]
@@ -0,0 +1,29 @@
+import struct
+
+import cv2
+import numpy as np
+
+from square_footage_estimator import estimate_area_from_image
+
+
+def _with_orientation(jpeg, orientation):
+    """``jpeg`` with an EXIF APP1 segment carrying only the Orientation tag."""
+    ifd = struct.pack(">HHHIHHI", 1, 0x0112, 3, 1, orientation, 0, 0)
+    exif = b"Exif\x00\x00" + b"MM\x00\x2a\x00\x00\x00\x08" + ifd
+    return jpeg[:2] + b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif + jpeg[2:]
+
+
+def test_rotated_jpeg_box_in_oriented_pixels():
+    # Stored landscape, displayed portrait: orientation 6 rotates 90 degrees clockwise
+    stored = np.full((1600, 2400), 255, np.uint8)
+    cv2.rectangle(stored, (400, 300), (2000, 1200), 0, 8)
+    jpeg = _with_orientation(cv2.imencode(".jpg", stored)[1].tobytes(), 6)
+    oriented = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_GRAYSCALE)
+    assert oriented.shape == (2400, 1600)
+
+    result = estimate_area_from_image(jpeg)
+    expected = estimate_area_from_image(oriented)
+    x, y, w, h = result["bounding_box"]
+    assert x + w <= 1600 and y + h <= 2400
+    assert np.allclose(result["bounding_box"], expected["bounding_box"], atol=4)
+    assert abs(result["estimated_area_sqft"] - expected["estimated_area_sqft"]) < 1
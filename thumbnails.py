@@ -0,0 +1,38 @@
+import os
+import uuid
+
+import cv2
+
+THUMB_DIR = os.path.join("uploads", "blobs", "thumbs")
+THUMBNAIL_SIZES = (256, 1024)
+
+
+def digest_of(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def thumbnail_path(digest, size):
+    return os.path.join(THUMB_DIR, f"{digest}_{size}.webp")
+
+
+def make_thumbnails(path, sizes=THUMBNAIL_SIZES):
+    """Write downscaled WebP derivatives of the image at ``path``; runs on the process pool."""
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        return []
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    height, width = image.shape[:2]
+    written = []
+    for size in sizes:
+        scale = min(1.0, size / max(height, width))
+        if scale < 1.0:
+            dims = (max(1, round(width * scale)), max(1, round(height * scale)))
+            resized = cv2.resize(image, dims, interpolation=cv2.INTER_AREA)
+        else:
+            resized = image
+        target = thumbnail_path(digest_of(path), size)
+        partial = f"{target}.{uuid.uuid4().hex}.webp"
+        cv2.imwrite(partial, resized, [cv2.IMWRITE_WEBP_QUALITY, 80])
+        os.replace(partial, target)
+        written.append(target)
+    return written
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import uuid
+
+from fastapi import HTTPException
+
+from executors import executors
+
+UPLOAD_DIR = "uploads"
+CHUNK_SIZE = 256 * 1024
+MAX_FILE_BYTES = int(os.getenv("MAX_UPLOAD_FILE_BYTES", str(15 * 1024 * 1024)))
+MAX_REQUEST_BYTES = int(os.getenv("MAX_UPLOAD_REQUEST_BYTES", str(120 * 1024 * 1024)))
+
+IMAGE_TYPES = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/heic": ".heic",
+}
+
+
+def sniff_content_type(head: bytes):
+    """Content type from the file's magic bytes, or None if it is not a known type."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return None
+
+
+class UploadBudget:
+    """Byte allowance shared by every file saved for one request."""
+
+    def __init__(self, max_bytes=MAX_REQUEST_BYTES):
+        self.remaining = max_bytes
+
+    def consume(self, size):
+        self.remaining -= size
+        if self.remaining < 0:
+            raise HTTPException(status_code=413, detail="Upload too large")
+
+
+def check_type(head, allowed):
+    content_type = sniff_content_type(head)
+    if content_type not in allowed:
+        raise HTTPException(status_code=415, detail="Unsupported file type")
+    return content_type
+
+
+async def iter_upload(uploaded, budget=None, max_bytes=MAX_FILE_BYTES):
+    """Yield an upload's chunks, enforcing the per-file and per-request limits as they arrive."""
+    size = 0
+    while True:
+        chunk = await uploaded.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"{uploaded.filename or 'File'} is too large")
+        if budget:
+            budget.consume(len(chunk))
+        yield chunk
+
+
+async def save_upload(uploaded, prefix, budget=None, max_bytes=MAX_FILE_BYTES, allowed=IMAGE_TYPES):
+    """Stream an upload to uploads/ and return its path, or None when nothing was sent.
+
+    The extension comes from the sniffed content type rather than the
+    client-supplied name, and a partial file is removed if a limit trips.
+    """
+    if not uploaded or not uploaded.filename:
+        return None
+    chunks = iter_upload(uploaded, budget, max_bytes)
+    first = await anext(chunks, b"")
+    if not first:
+        return None
+    extension = IMAGE_TYPES.get(check_type(first, allowed), "")
+    path = os.path.join(UPLOAD_DIR, f"{prefix}_{uuid.uuid4()}{extension}")
+    partial = path + ".part"
+    out = await executors.run_io(open, partial, "wb")
+    try:
+        await executors.run_io(out.write, first)
+        async for chunk in chunks:
+            await executors.run_io(out.write, chunk)
+    except BaseException:
+        await executors.run_io(out.close)
+        await executors.run_io(os.remove, partial)
+        raise
+    await executors.run_io(out.close)
+    await executors.run_io(os.replace, partial, path)
+    return path
+
+
+async def save_uploads(files, prefix, budget=None, max_bytes=MAX_FILE_BYTES, allowed=IMAGE_TYPES):
+    """Save several uploads concurrently; if any fails, the ones already written are removed."""
+    results = await asyncio.gather(
+        *(save_upload(f, prefix, budget, max_bytes, allowed) for f in files or []),
+        return_exceptions=True,
+    )
+    paths = [r for r in results if isinstance(r, str)]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        for path in paths:
+            await executors.run_io(os.remove, path)
+        raise errors[0]
+    return paths
+
+
+async def read_upload(uploaded, max_bytes=MAX_FILE_BYTES, allowed=IMAGE_TYPES):
+    """Read a whole upload into memory under the same size and type checks."""
+    data = bytearray()
+    async for chunk in iter_upload(uploaded, max_bytes=max_bytes):
+        if not data:
+            check_type(chunk, allowed)
+        data += chunk
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty upload")
+    return bytes(data)